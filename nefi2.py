@@ -16,10 +16,12 @@ def runner(args):
     Args:
         | *args* : a Namespace object of supplied command-line arguments
     """
-    if args.dir or args.file:
+    if args.benchmark:
+        Main.benchmark_mode(args)
+    elif args.dir or args.file:
         Main.batch_mode(args)
     else:
-        Main.gui_mode()
+        Main.gui_mode(args)
 
 
 if __name__ == '__main__':
@@ -40,5 +42,80 @@ if __name__ == '__main__':
     prs.add_argument('-o', '--out',
                      help='Specify output directory.',
                      required=False)
+    prs.add_argument('-j', '--jobs',
+                     help='Specify the number of images to process '
+                          'in parallel, or the number of tiles with '
+                          '--tile-size.',
+                     type=int, default=1,
+                     required=False)
+    prs.add_argument('-c', '--cache',
+                     help='Specify a directory for caching step results '
+                          'between runs.',
+                     required=False)
+    prs.add_argument('-s', '--sweep',
+                     help='Specify a sweep json file listing algorithm '
+                          'settings to run in all combinations.',
+                     required=False)
+    prs.add_argument('-t', '--tile-size',
+                     help='Specify a tile size in pixels to run the '
+                          'preprocessing, segmentation and Guo Hall thinning '
+                          'of large images tile by tile. Graph detection runs '
+                          'per tile only with the "branches" edge tracing, '
+                          'the other engines trace the stitched skeleton in '
+                          'one process.',
+                     type=int,
+                     required=False)
+    prs.add_argument('-g', '--graph-format',
+                     help='Specify the graph export format: multiline '
+                          'adjacency list, numpy archive or gzip '
+                          'compressed edge list.',
+                     choices=['adjlist', 'npz', 'csv'], default='adjlist',
+                     required=False)
+    prs.add_argument('--start-at',
+                     help='Start after the segmentation or graph detection '
+                          'step, reading segmentation masks or npz/csv '
+                          'graph files as input.',
+                     choices=['segmentation', 'graph'],
+                     required=False)
+    prs.add_argument('--profile',
+                     help='Measure time and memory of every pipeline step '
+                          'and write a json and csv report to the output '
+                          'directory.',
+                     action='store_true',
+                     required=False)
+    prs.add_argument('--benchmark',
+                     help='Run the default pipelines on the sample images '
+                          'and their 2x, 4x and 8x upscaled variants and '
+                          'write a benchmark report to the output directory.',
+                     action='store_true',
+                     required=False)
+    prs.add_argument('--baseline',
+                     help='Specify a benchmark.json report of an earlier '
+                          '--benchmark run to compare with.',
+                     required=False)
+    prs.add_argument('--threshold',
+                     help='Specify the growth of step time or peak memory '
+                          'over --baseline in percent reported as '
+                          'regression.',
+                     type=float, default=25,
+                     required=False)
+    prs.add_argument('--scratch-dir',
+                     help='Specify a directory for memory-mapped '
+                          'intermediate arrays of large images.',
+                     required=False)
+    prs.add_argument('--spill-size',
+                     help='Specify the size in MB from which intermediate '
+                          'arrays are memory-mapped into --scratch-dir.',
+                     type=int, default=256,
+                     required=False)
+    prs.add_argument('--alg-manifest',
+                     help='Specify a json file listing the available '
+                          'algorithms, it is used instead of scanning the '
+                          'algorithms directory until an algorithm changes.',
+                     required=False)
+    prs.add_argument('--cache-size',
+                     help='Specify the step cache size limit in MB.',
+                     type=int, default=2048,
+                     required=False)
     arguments = prs.parse_args()
     runner(arguments)
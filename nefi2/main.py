@@ -7,16 +7,14 @@ It also enables console batch processing mode.
 """
 import os
 
+from nefi2.model.benchmark import Benchmark
 from nefi2.model.ext_loader import ExtensionLoader
-from nefi2.model.pipeline import Pipeline
-from nefi2.view.main_controller import MainView
+from nefi2.model.pipeline import Pipeline, START_CATEGORIES
+from nefi2.model.sweep import ParameterSweep
 
 import sys
 import argparse
 import ctypes
-from PyQt5 import QtGui
-from PyQt5.QtWidgets import QApplication
-import qdarkstyle
 
 
 __authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com",
@@ -26,16 +24,29 @@ __authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com",
 class Main:
 
     @staticmethod
-    def gui_mode():
+    def gui_mode(args=None):
         """
         Start NEFI2 GUI
+        Qt is imported here only, batch mode runs without it.
+
+        Args:
+            | *args* (dict) : argument dict returned by ArgumentParser
+
         """
+        from PyQt5 import QtGui
+        from PyQt5.QtWidgets import QApplication
+        import qdarkstyle
+        from nefi2.view.main_controller import MainView
+
         myappid = 'nefi2.0' # arbitrary string
         if sys.platform == 'win32' or sys.platform == 'win64':
             ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
-        extloader = ExtensionLoader()
+        extloader = ExtensionLoader(args.alg_manifest if args is not None
+                                    else None)
         pipeline = Pipeline(extloader.cats_container)
+        if args is not None and args.cache:
+            pipeline.set_step_cache(args.cache, args.cache_size * 1024 ** 2)
         app = QApplication(sys.argv)
         app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
         app.setQuitOnLastWindowClosed(True)
@@ -54,13 +65,16 @@ class Main:
             | *args* (dict) : argument dict returned by ArgumentParser
 
         """
-        extloader = ExtensionLoader()
+        extloader = ExtensionLoader(args.alg_manifest)
         pipeline = Pipeline(extloader.cats_container)
         # processing args values
         if args.pipeline:
             # load the specified pipeline file
             # default url
             pipeline.load_pipeline_json(args.pipeline)
+        if args.start_at:
+            # read masks or graphs and skip the steps producing them
+            pipeline.set_start_at(START_CATEGORIES[args.start_at])
         if args.dir:
             # load the images from the specified source dir
             pipeline.set_input(args.dir)
@@ -69,7 +83,46 @@ class Main:
             pipeline.set_input(args.file)
         if args.out:
             pipeline.set_output_dir(args.out)
-        pipeline.process_batch()
+        if args.cache:
+            # reuse step results of earlier runs
+            pipeline.set_step_cache(args.cache, args.cache_size * 1024 ** 2)
+        # graph export format
+        pipeline.graph_format = args.graph_format
+        if args.profile:
+            # report time and memory of every step
+            pipeline.enable_profiling()
+        if args.scratch_dir:
+            # keep large intermediate arrays in memory-mapped files
+            pipeline.set_scratch_dir(args.scratch_dir,
+                                     args.spill_size * 1024 ** 2)
+        if args.tile_size:
+            # process large images tile by tile
+            pipeline.tile_size = args.tile_size
+        if args.sweep:
+            # run all combinations of the swept settings
+            ParameterSweep(pipeline, args.sweep).run()
+        else:
+            pipeline.process_batch(args.jobs)
+
+
+    @staticmethod
+    def benchmark_mode(args):
+        """
+        Run the default pipelines on the sample images without the UI and
+        compare the measurements with a baseline report
+
+        Args:
+            | *args* (dict) : argument dict returned by ArgumentParser
+
+        """
+        out_dir = args.out or os.path.join(os.getcwd(), 'benchmark')
+        benchmark = Benchmark(out_dir)
+        benchmark.run()
+        if args.baseline:
+            benchmark.compare(args.baseline, args.threshold / 100)
+        benchmark.write_report()
+        if benchmark.failed or benchmark.regressions:
+            sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains AlgorithmRegistry class that finds the algorithm files in
+nefi2/model/algorithms once per process. Every algorithm module is imported
+once, under its package name, so that algorithm instances can be pickled by
+worker processes. Categories only hold the registry entries of their
+algorithms and instantiate an AlgBody when the algorithm is selected, see
+``Category.get_algorithm()``. New instances are cloned from one prototype
+per algorithm and share the definitions of its ui elements.
+
+The registry can keep a json manifest with the name and category of every
+algorithm. As long as neither the algorithms directory nor one of the listed
+files changed, the manifest is used instead of scanning the directory and
+importing all modules.
+"""
+import importlib
+import json
+import os
+import re
+from collections import OrderedDict
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+ALG_DIR = os.path.join('nefi2', 'model', 'algorithms')
+ALG_PACKAGE = 'nefi2.model.algorithms'
+EXCLUDED = re.compile(r'.*.pyc|__init__|_alg.py|__pycache__|_utility.py|'
+                      r'_thread|_graph.py')
+MANIFEST_VERSION = 1
+
+_registry = None
+
+
+def load_registry(manifest_path=None):
+    """
+    Return the algorithm registry of the process, it is created on the first
+    call.
+
+    Args:
+        | *manifest_path* (str): optional manifest file used by the first
+          call, see AlgorithmRegistry
+
+    Returns:
+        | *registry* (AlgorithmRegistry): the registry
+
+    """
+    global _registry
+    if _registry is None:
+        _registry = AlgorithmRegistry(ALG_DIR, manifest_path)
+    return _registry
+
+
+def file_stamp(fpath):
+    """
+    Return the modification time in ns and the size of a file.
+    """
+    stat = os.stat(fpath)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class AlgSpec:
+    """
+    Registry entry of an algorithm.
+    """
+
+    def __init__(self, name, category, module_name, prototype=None):
+        """
+        Args:
+            | *name* (str): algorithm name
+            | *category* (str): name of the category the algorithm belongs to
+            | *module_name* (str): module name in nefi2.model.algorithms
+            | *prototype* (Algorithm): an instance with the default settings,
+              created by the first ``create()`` call if not given
+
+        """
+        self.name = name
+        self.category = category
+        self.module_name = module_name
+        self._prototype = prototype
+
+    def __deepcopy__(self, memo):
+        # registry entries are shared by all copies of a category
+        return self
+
+    def create(self):
+        """
+        Instantiate the algorithm.
+
+        Returns:
+            | *alg* (Algorithm): a new AlgBody instance with the default
+              settings, see ``Algorithm.clone()``
+
+        """
+        if self._prototype is None:
+            module = importlib.import_module(ALG_PACKAGE + '.' +
+                                             self.module_name)
+            self._prototype = module.AlgBody()
+        return self._prototype.clone()
+
+
+class AlgorithmRegistry:
+    """
+    All algorithms found in the algorithms directory.
+    """
+
+    def __init__(self, alg_dir=ALG_DIR, manifest_path=None):
+        """
+        Args:
+            | *alg_dir* (str): a directory path for algorithms
+            | *manifest_path* (str): optional json manifest, it is written
+              after every scan of *alg_dir*
+
+        Public Attributes:
+            | *specs* (list): AlgSpec of every algorithm in file order
+
+        Raises:
+            | *FileNotFoundError* : if no algorithm files were found
+
+        """
+        self.alg_dir = alg_dir
+        self.manifest_path = manifest_path
+        self.specs = self.read_manifest()
+        if self.specs is None:
+            self.specs = self.scan()
+
+    def category_specs(self, cat_name):
+        """
+        Return the AlgSpec of every algorithm of a category.
+        """
+        return [spec for spec in self.specs if spec.category == cat_name]
+
+    def scan(self):
+        """
+        Import every algorithm module of the algorithms directory and
+        instantiate its AlgBody to learn the algorithm name and category.
+        Writes the manifest if one is set.
+
+        Returns:
+            | *specs* (list): AlgSpec of every algorithm
+
+        """
+        found_algs = [f for f in sorted(os.listdir(self.alg_dir))
+                      if not EXCLUDED.match(f)]
+        if not found_algs:
+            raise FileNotFoundError("No algorithm files were found in "
+                                    "./model/algorithms")
+        specs = []
+        entries = []
+        for alg_file in found_algs:
+            module_name = alg_file.split('.')[0]
+            entry = OrderedDict([('file', alg_file),
+                                 ('stamp', file_stamp(os.path.join(
+                                     self.alg_dir, alg_file))),
+                                 ('name', None), ('category', None)])
+            entries.append(entry)
+            module = importlib.import_module(ALG_PACKAGE + '.' + module_name)
+            try:
+                alg = module.AlgBody()
+            except AttributeError as ex:
+                print("AttributeError in AlgorithmRegistry.scan()", ex)
+                continue
+            entry['name'], entry['category'] = alg.get_name(), alg.belongs()
+            specs.append(AlgSpec(entry['name'], entry['category'],
+                                 module_name, alg))
+        if self.manifest_path is not None:
+            self.write_manifest(entries)
+        return specs
+
+    def read_manifest(self):
+        """
+        Read the manifest if it is set and still valid.
+
+        Returns:
+            | *specs* (list): AlgSpec of every algorithm, None if the
+              algorithms directory has to be scanned
+
+        """
+        if self.manifest_path is None or \
+                not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest['version'] != MANIFEST_VERSION or \
+                    manifest['stamp'] != file_stamp(self.alg_dir)[:1]:
+                return None
+            for entry in manifest['algorithms']:
+                if entry['stamp'] != file_stamp(os.path.join(self.alg_dir,
+                                                             entry['file'])):
+                    return None
+        except (OSError, ValueError, KeyError, TypeError):
+            # an unreadable or outdated manifest is replaced after the scan
+            return None
+        return [AlgSpec(entry['name'], entry['category'],
+                        entry['file'].split('.')[0])
+                for entry in manifest['algorithms']
+                if entry['name'] is not None]
+
+    def write_manifest(self, entries):
+        """
+        Write the manifest, failing to write it only prints a warning.
+
+        Args:
+            | *entries* (list): an OrderedDict per algorithm file
+
+        """
+        manifest = OrderedDict([('version', MANIFEST_VERSION),
+                                ('stamp', file_stamp(self.alg_dir)[:1]),
+                                ('algorithms', entries)])
+        try:
+            with open(self.manifest_path, 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+        except OSError as ex:
+            print("WARNING in AlgorithmRegistry.write_manifest()", ex)
+
+
+if __name__ == '__main__':
+    pass
@@ -3,7 +3,7 @@
 This is Algorithm master class and all algorithms must inherit from it.
 """
 import collections
-from PyQt5.QtCore import QObject, pyqtSlot
+import copy
 
 __authors__ = {"Dennis Groß": "gdennis91@googlemail.com",
                "Pavel Shkadzko": "p.shkadzko@gmail.com",
@@ -90,6 +90,39 @@ class Algorithm:
         """
         raise NotImplementedError
 
+    def tile_halo(self):
+        """
+        Large images can be processed in tiles, see nefi2.model.tiling.
+        A tile is processed together with a border (halo) of the surrounding
+        pixels, so that it gets the same result as if the whole image was
+        processed. Algorithms of the Preprocessing and Segmentation categories
+        whose result for a pixel only depends on a neighborhood of it should
+        override this method and return the neighborhood radius.
+        By default an algorithm works on the whole image and can not be
+        tiled, e.g. because it computes a histogram of the whole image.
+
+        Returns:
+            | *halo* (int): the number of pixels a tile needs on each side,
+              None if the algorithm can not process an image in tiles
+
+        """
+        return None
+
+    def process_tiled(self, args, tile_size, jobs):
+        """
+        Process a large image tile by tile, see nefi2.model.tiling.
+        Algorithms which can split their work into tiles override this
+        method, the result has to be the same as the one of ``process()``.
+        By default the whole image is processed at once.
+
+        Args:
+            | *args* (list): a list of ndarray and Graph
+            | *tile_size* (int): tile length in pixels
+            | *jobs* (int): number of worker processes for the tiles
+
+        """
+        self.process(args)
+
     def get_name(self):
         """
         This method returns the name of the implemented algorithm. E.g. int case the contributor
@@ -166,7 +199,6 @@ class Algorithm:
         """
         self.modified = True
 
-    @pyqtSlot(bool)
     def set_store_image(self, state):
         self.store_image = state
 
@@ -179,6 +211,7 @@ class Algorithm:
             |name: name of the ui element we are looking for
 
         Returns:
+            |the ui element or None if the algorithm has no such element
 
         """
         for int_slider in self.integer_sliders:
@@ -190,18 +223,50 @@ class Algorithm:
                 return float_slider
 
         # checkboxes are optional
-        if self.checkboxes:
-            for checkbox in self.checkboxes:
-                if checkbox.name == name:
-                    return checkbox
-        else:
-            return None
+        for checkbox in self.checkboxes:
+            if checkbox.name == name:
+                return checkbox
 
         for dropdown in self.drop_downs:
             if dropdown.name == name:
                 return dropdown
 
-        raise FileNotFoundError("could not find ui element: " + name)
+        return None
+
+    def clone(self, settings=None):
+        """
+        Create a new instance of the algorithm with the same settings without
+        running its constructor. Unlike copy.deepcopy() the new instance
+        shares the definitions of the ui elements (name, bounds, step size,
+        options) with this one, only the ui elements themselves and their
+        values are copied. The result is not copied.
+
+        Args:
+            | *settings* (dict): optional {ui element name: value} dict
+              applied to the new instance
+
+        Returns:
+            | *alg* (Algorithm): the new instance
+
+        """
+        alg = self.__class__.__new__(self.__class__)
+        alg.__dict__.update(self.__dict__)
+        # shallow copies of the ui elements, rebound wherever they are used
+        elements = {}
+        for name, value in self.__dict__.items():
+            if isinstance(value, UI_ELEMENTS):
+                elements[id(value)] = copy.copy(value)
+                setattr(alg, name, elements[id(value)])
+        for name in ('integer_sliders', 'float_sliders', 'checkboxes',
+                     'drop_downs'):
+            setattr(alg, name, [elements.get(id(element)) or
+                                copy.copy(element)
+                                for element in getattr(self, name)])
+        alg.result = {"img": None, "graph": None}
+        if settings:
+            for name, value in settings.items():
+                alg.find_ui_element(name).set_value(value)
+        return alg
 
 
 class IntegerSlider:
@@ -231,14 +296,11 @@ class IntegerSlider:
         self.upper = upper
         self.name = name
 
-    @pyqtSlot(int)
     def set_value(self, arg1):
         """
         The set_value method is used by the UI and the batch-mode of NEFI as
         an input source of selected values for this particular slider instance.
-        The @pyqtSlot(int) decoration declares this method as as QT-Slot.
-        To get more information about Slots and Signals in QT read about it in
-        the official QT documentation.
+        The view declares this method as Qt slot, the model does not import Qt.
 
         Args:
             | *arg1*: the integer value selected in the ui or the pipeline in
@@ -278,14 +340,11 @@ class FloatSlider:
         self.upper = upper
         self.name = name
 
-    @pyqtSlot(float)
     def set_value(self, arg1):
         """
         The set_value method is used by the UI and the batch-mode of NEFI as an
         input source of selected values for this particular slider instance.
-        The @pyqtSlot(int) decoration declares this method as as QT-Slot.
-        To get more information about Slots and Signals in QT read about it in
-        the official QT documentation.
+        The view declares this method as Qt slot, the model does not import Qt.
 
         Args:
             | *arg1*: the integer value selected in the ui or the pipeline in
@@ -316,14 +375,11 @@ class CheckBox:
         self.value = default
         self.name = name
 
-    @pyqtSlot(bool)
     def set_value(self, arg1):
         """
         The set_value method is used by the UI and the batch-mode of NEFI as an
         input source of selected values for this particular checkbox instance.
-        The @pyqtSlot(bool) decoration declares this method as as QT-Slot. To
-        get more information about Slots and Signals in QT read about it in the
-        official QT documentation.
+        The view declares this method as Qt slot, the model does not import Qt.
 
         Args:
             | *arg1*: the boolean value selected in the ui or the pipeline in
@@ -355,14 +411,11 @@ class DropDown:
         else:
             self.value = list(options)[0]
 
-    @pyqtSlot(str)
     def set_value(self, arg1):
         """
         The set_value method is used by the UI and the batch-mode of NEFI as an
         inputsource of selected values for this particular DropDown instance.
-        The @pyqtSlot(str) decoration declares this method as as QT-Slot. To
-        get more information about Slots and Signals in QT read about it in the
-        official QT documentation.
+        The view declares this method as Qt slot, the model does not import Qt.
 
         Args:
             | *arg1*: the string value selected in the ui or the pipeline in
@@ -373,3 +426,7 @@ class DropDown:
             raise AssertionError("Given parameter " + str(arg1)  +" for " + str(self.name) + " setting is no valid option.")
 
         self.value = arg1
+
+
+# ui element types copied by ``Algorithm.clone()``
+UI_ELEMENTS = (IntegerSlider, FloatSlider, CheckBox, DropDown)
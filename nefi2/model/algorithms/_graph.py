@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact array backed graph used by graph detection and graph filtering.
+
+A networkx Graph keeps a dict per node and per edge, which costs several
+hundred bytes per edge. CompactGraph keeps the node coordinates, the edge end
+points and every edge attribute in flat numpy arrays instead. It offers the
+small part of the networkx interface the drawing and export code relies on and
+is converted to a networkx Graph only when networkx functionality is needed.
+"""
+from collections import OrderedDict
+import networkx as nx
+import numpy as np
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+# edge attributes computed by graph detection, in export order
+EDGE_ATTRIBUTES = ('pixels', 'length', 'width', 'width_var')
+
+
+class CompactGraph:
+    """
+    Undirected graph without parallel edges and self loops, stored as arrays.
+
+    Nodes are pixel coordinates (x, y) given by the *xs* and *ys* arrays,
+    edge *i* connects the nodes with the indices *src[i]* and *dst[i]*.
+    """
+
+    def __init__(self, xs=None, ys=None, src=None, dst=None, edge_attrs=None):
+        """
+        Args:
+            | *xs*, *ys* (ndarray): node coordinates
+            | *src*, *dst* (ndarray): node indices of the edge end points
+            | *edge_attrs* (OrderedDict): edge attribute name -> array with
+              one value per edge
+
+        Public Attributes:
+            | *xs*, *ys* (ndarray): node coordinates
+            | *src*, *dst* (ndarray): node indices of the edge end points
+            | *edge_attrs* (OrderedDict): edge attribute arrays
+
+        """
+        self.xs = np.zeros(0, np.int64) if xs is None else np.asarray(xs)
+        self.ys = np.zeros(0, np.int64) if ys is None else np.asarray(ys)
+        self.src = np.zeros(0, np.intp) if src is None else np.asarray(src)
+        self.dst = np.zeros(0, np.intp) if dst is None else np.asarray(dst)
+        self.edge_attrs = OrderedDict() if edge_attrs is None else \
+            OrderedDict((name, np.asarray(values))
+                        for name, values in edge_attrs.items())
+
+    def __len__(self):
+        return len(self.xs)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the arrays of the graph in bytes.
+        """
+        return sum(arr.nbytes for arr in
+                   [self.xs, self.ys, self.src, self.dst] +
+                   list(self.edge_attrs.values()))
+
+    def number_of_nodes(self):
+        return len(self.xs)
+
+    def number_of_edges(self):
+        return len(self.src)
+
+    def copy(self):
+        return CompactGraph(self.xs.copy(), self.ys.copy(), self.src.copy(),
+                            self.dst.copy(),
+                            OrderedDict((name, values.copy()) for name, values
+                                        in self.edge_attrs.items()))
+
+    def nodes_iter(self):
+        """
+        Iterate over the nodes as (x, y) tuples.
+        """
+        return zip(self.xs.tolist(), self.ys.tolist())
+
+    def edges_iter(self, data=False):
+        """
+        Iterate over the edges as pairs of (x, y) tuples, with a dict of
+        edge attributes as third element if *data* is True.
+        """
+        xs, ys = self.xs.tolist(), self.ys.tolist()
+        names = list(self.edge_attrs)
+        columns = [values.tolist() for values in self.edge_attrs.values()]
+        for i, (u, v) in enumerate(zip(self.src.tolist(), self.dst.tolist())):
+            if data:
+                yield ((xs[u], ys[u]), (xs[v], ys[v]),
+                       dict(zip(names, [column[i] for column in columns])))
+            else:
+                yield (xs[u], ys[u]), (xs[v], ys[v])
+
+    def edge_attribute(self, name):
+        """
+        Return the values of an edge attribute for all edges.
+
+        Raises:
+            | *KeyError* : if the graph has no such edge attribute
+
+        """
+        return self.edge_attrs[name]
+
+    def degree(self):
+        """
+        Return the degree of every node as array.
+        """
+        return np.bincount(np.concatenate([self.src, self.dst]),
+                           minlength=len(self.xs))
+
+    def component_labels(self):
+        """
+        Label the connected components, see ``union_find_labels()``.
+
+        Returns:
+            | *labels* (ndarray): component label 0, ..., k - 1 of every node,
+              components are numbered in the order of their first node
+
+        """
+        return union_find_labels(len(self.xs), self.src, self.dst)
+
+    def keep_edges(self, mask):
+        """
+        Remove all edges for which *mask* is False.
+
+        Args:
+            | *mask* (ndarray): boolean array with one value per edge
+
+        """
+        self.src = self.src[mask]
+        self.dst = self.dst[mask]
+        for name in self.edge_attrs:
+            self.edge_attrs[name] = self.edge_attrs[name][mask]
+
+    def keep_nodes(self, mask):
+        """
+        Remove all nodes for which *mask* is False together with their
+        edges.
+
+        Args:
+            | *mask* (ndarray): boolean array with one value per node
+
+        """
+        mask = np.asarray(mask, np.bool_)
+        self.keep_edges(mask[self.src] & mask[self.dst])
+        new_index = np.cumsum(mask) - 1
+        self.src = new_index[self.src]
+        self.dst = new_index[self.dst]
+        self.xs = self.xs[mask]
+        self.ys = self.ys[mask]
+
+    def to_networkx(self):
+        """
+        Convert to a networkx Graph with (x, y) tuple nodes.
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(self.nodes_iter())
+        graph.add_edges_from(self.edges_iter(data=True))
+        return graph
+
+    @classmethod
+    def from_networkx(cls, graph):
+        """
+        Convert a networkx Graph with (x, y) tuple nodes. Only edge
+        attributes present on every edge are kept.
+        """
+        nodes = list(graph.nodes_iter())
+        index = dict((node, i) for i, node in enumerate(nodes))
+        edges = list(graph.edges_iter(data=True))
+        names = [name for name in EDGE_ATTRIBUTES
+                 if all(name in data for _, _, data in edges)]
+        return cls(np.array([x for x, _ in nodes], np.int64),
+                   np.array([y for _, y in nodes], np.int64),
+                   np.array([index[u] for u, _, _ in edges], np.intp),
+                   np.array([index[v] for _, v, _ in edges], np.intp),
+                   OrderedDict((name, np.array([data[name]
+                                                for _, _, data in edges]))
+                               for name in names))
+
+
+def union_find_labels(num_nodes, src, dst):
+    """
+    Label the connected components of a graph given as edge arrays with a
+    vectorized union-find. Every round hooks the root of the larger index of
+    each edge onto the smaller one and then compresses all paths, until no
+    edge connects two different roots.
+
+    Args:
+        | *num_nodes* (int): number of nodes
+        | *src*, *dst* (ndarray): node indices of the edge end points
+
+    Returns:
+        | *labels* (ndarray): component label 0, ..., k - 1 of every node,
+          components are numbered in the order of their first node
+
+    """
+    parent = np.arange(num_nodes)
+    while True:
+        root_src, root_dst = parent[src], parent[dst]
+        differ = root_src != root_dst
+        if not differ.any():
+            break
+        root_src, root_dst = root_src[differ], root_dst[differ]
+        np.minimum.at(parent, np.maximum(root_src, root_dst),
+                      np.minimum(root_src, root_dst))
+        # path compression, afterwards every node points to its root
+        while True:
+            grand_parent = parent[parent]
+            if np.array_equal(grand_parent, parent):
+                break
+            parent = grand_parent
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels.reshape(-1)
+
+
+def to_networkx(graph):
+    """
+    Return *graph* as networkx Graph, converting a CompactGraph.
+    """
+    if isinstance(graph, CompactGraph):
+        return graph.to_networkx()
+    return graph
+
+
+def edge_attribute_column(graph, name):
+    """
+    Return the values of an edge attribute for all edges as array, in the
+    order of ``graph.edges_iter()``.
+
+    Args:
+        | *graph* : networkx Graph or CompactGraph
+        | *name* (str): edge attribute name
+
+    Raises:
+        | *KeyError* : if an edge does not have the attribute
+
+    """
+    if isinstance(graph, CompactGraph):
+        return graph.edge_attribute(name)
+    return np.array([data[name] for _, _, data in graph.edges_iter(data=True)],
+                    np.float64)
+
+
+def to_compact(graph):
+    """
+    Return *graph* as CompactGraph, converting a networkx Graph.
+    """
+    if isinstance(graph, CompactGraph):
+        return graph
+    return CompactGraph.from_networkx(graph)
+
+
+def like_input(graph, original):
+    """
+    Return *graph* in the type of the *original* input of a filter, so that
+    filters keep the graph type.
+    """
+    if isinstance(original, CompactGraph):
+        return to_compact(graph)
+    return to_networkx(graph)
+
+
+if __name__ == '__main__':
+    pass
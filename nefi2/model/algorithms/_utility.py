@@ -2,8 +2,11 @@
 Various help functions for processing results.
 """
 import cv2
+import networkx
 import numpy
+from nefi2.model.algorithms._graph import CompactGraph
 import operator
+from collections import OrderedDict
 
 
 __authors__ = {"Martino Bruni": "bruni.martino92@gmail.com"}
@@ -104,5 +107,40 @@ def check_operator(dropdown):
     return op_object
 
 
+def graph_statistics(graph):
+    """
+    Compute summary statistics of a graph.
+
+    Args:
+        | *graph* : the graph or None
+
+    Returns:
+        | *stats* (OrderedDict): number of nodes, edges and connected
+          components, total edge length and mean edge width
+
+    """
+    stats = OrderedDict([('nodes', 0), ('edges', 0), ('components', 0),
+                         ('total_length', 0.0), ('mean_width', 0.0)])
+    if graph is None:
+        return stats
+    stats['nodes'] = graph.number_of_nodes()
+    stats['edges'] = graph.number_of_edges()
+    if isinstance(graph, CompactGraph):
+        stats['components'] = len(numpy.unique(graph.component_labels()))
+        zeros = numpy.zeros(graph.number_of_edges())
+        lengths = graph.edge_attrs.get('length', zeros)
+        widths = graph.edge_attrs.get('width', zeros)
+    else:
+        stats['components'] = networkx.number_connected_components(graph)
+        lengths = [data.get('length', 0.0)
+                   for _, _, data in graph.edges_iter(data=True)]
+        widths = [data.get('width', 0.0)
+                  for _, _, data in graph.edges_iter(data=True)]
+    if len(lengths):
+        stats['total_length'] = float(numpy.sum(lengths))
+        stats['mean_width'] = float(numpy.mean(widths))
+    return stats
+
+
 if __name__ == '__main__':
     pass
@@ -60,6 +60,12 @@ class AlgBody(Algorithm):
                                                    self.blocksize.value*2+1,
                                                    self.constant.value)
 
+    def tile_halo(self):
+        """
+        The threshold of a pixel is the mean of the block around it.
+        """
+        return self.blocksize.value
+
 
 if __name__ == '__main__':
     pass
@@ -92,6 +92,12 @@ class AlgBody(Algorithm):
                     channels[2] = bilateral(channels[2])
                 self.result['img'] = cv2.merge(channels)
 
+    def tile_halo(self):
+        """
+        The filter reaches *diameter* pixels around a pixel.
+        """
+        return self.diameter.value
+
 
 if __name__ == '__main__':
     pass
@@ -65,6 +65,12 @@ class AlgBody(Algorithm):
                                                      self.kernelsize.value*2+1))
             self.result['img'] = cv2.merge(channels)
 
+    def tile_halo(self):
+        """
+        The box filter reaches *kernelsize* pixels around a pixel.
+        """
+        return self.kernelsize.value
+
 
 if __name__ == '__main__':
     pass
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from nefi2.model.algorithms._alg import Algorithm, IntegerSlider, DropDown
 from nefi2.model.algorithms._utility import check_operator, draw_graph
+from nefi2.model.algorithms._graph import CompactGraph
 import networkx as nx
+import numpy as np
 
 
 __authors__ = {"Martino Bruni": "bruni.martino92@gmail.com"}
@@ -48,16 +50,21 @@ class AlgBody(Algorithm):
         Example: Remove all connected components of size greater or equal to 5
         Example: Remove all connected components of size exaclty 7
 
+        The components are labelled in one pass and all nodes of rejected
+        components are removed in one bulk operation, no subgraphs are
+        copied.
+
         Args:
             | *args* : A list which contains the image and the graph
         Raises:
             | *KeyError* : Filtering failed because the
              threshold connected component size is negative
         Returns:
-            | *graph* : A filtered networkx graph
+            | *graph* : A filtered networkx graph or CompactGraph
 
         """
         oper_str_value = self.operator.value
+        graph = args[1]
         try:
             if self.compnt_size.value < 0:
                 raise ArithmeticError("Connected_Components_Filter: Filtering \
@@ -66,21 +73,28 @@ class AlgBody(Algorithm):
                                       self.compnt_size.value)
 
             self.operator.value = check_operator(self.operator)
-            connected_components = sorted(
-                list(nx.connected_component_subgraphs(args[1])),
-                key=lambda graph: graph.number_of_nodes())
-            to_be_removed = [subgraph for subgraph in connected_components
-                             if self.operator.value(subgraph.number_of_nodes(),
-                                                    self.compnt_size.value)]
-            for subgraph in to_be_removed:
-                args[1].remove_nodes_from(subgraph)
-            print ('discarding a total of', len(to_be_removed),
+            if isinstance(graph, CompactGraph):
+                labels = graph.component_labels()
+                sizes = np.bincount(labels)
+                rejected = self.operator.value(sizes, self.compnt_size.value)
+                graph.keep_nodes(~rejected[labels])
+                removed_count = np.count_nonzero(rejected)
+            else:
+                to_be_removed = [component for component in
+                                 nx.connected_components(graph)
+                                 if self.operator.value(len(component),
+                                                        self.compnt_size.value)]
+                graph.remove_nodes_from(
+                    [node for component in to_be_removed
+                     for node in component])
+                removed_count = len(to_be_removed)
+            print ('discarding a total of', removed_count,
                    'connected components ...')
         except ArithmeticError as ex:
             print ('Exception caught in', ex)
         self.operator.value = oper_str_value
         self.result['img'] = args[0]
-        self.result['graph'] = args[1]
+        self.result['graph'] = graph
 
 
 if __name__ == '__main__':
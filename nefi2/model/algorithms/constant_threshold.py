@@ -46,5 +46,12 @@ class AlgBody(Algorithm):
                                            THRESHOLD_FG_COLOR,
                                            cv2.THRESH_BINARY_INV)[1]
 
+    def tile_halo(self):
+        """
+        Every pixel is thresholded on its own.
+        """
+        return 0
+
+
 if __name__ == '__main__':
     pass
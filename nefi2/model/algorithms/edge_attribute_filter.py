@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 from nefi2.model.algorithms._alg import Algorithm, DropDown, FloatSlider
 from nefi2.model.algorithms._utility import check_operator, draw_graph
+from nefi2.model.algorithms._graph import CompactGraph, edge_attribute_column
+import numpy as np
 
 
 __authors__ = {"Martino Bruni": "bruni.martino92@gmail.com"}
 
 
+OPERATORS = {"strictly smaller", "smaller or equal", "equal",
+             "greater or equal", "strictly greater"}
+
+
 class AlgBody(Algorithm):
     """
     Edge attribute filter algorithm implementation
@@ -21,6 +27,13 @@ class AlgBody(Algorithm):
              the given attribute
             | *operator* : A logical python operator.
              See python module operator
+            | *second_attribute* : An optional second edge attribute,
+             "none" disables the second predicate
+            | *second_threshold_value* : A threshold value for
+             the second attribute
+            | *second_operator* : A logical python operator for
+             the second attribute
+            | *combine* : How both predicates are combined, "and" or "or"
 
         """
         Algorithm.__init__(self)
@@ -31,12 +44,18 @@ class AlgBody(Algorithm):
         self.attribute_threshold_value = FloatSlider("Attribute treshold",
                                                      0.0, 20.0, 0.1, 10.0)
         self.float_sliders.append(self.attribute_threshold_value)
-        self.operator = DropDown("Operator", {"strictly smaller",
-                                              "smaller or equal",
-                                              "equal",
-                                              "greater or equal",
-                                              "strictly greater"})
+        self.operator = DropDown("Operator", OPERATORS)
         self.drop_downs.append(self.operator)
+        self.second_attribute = DropDown("Second Attribute",
+                                         {"none", "width", "length"}, "none")
+        self.drop_downs.append(self.second_attribute)
+        self.second_threshold_value = FloatSlider("Second Attribute treshold",
+                                                  0.0, 20.0, 0.1, 10.0)
+        self.float_sliders.append(self.second_threshold_value)
+        self.second_operator = DropDown("Second Operator", OPERATORS)
+        self.drop_downs.append(self.second_operator)
+        self.combine = DropDown("Combine", {"and", "or"}, "and")
+        self.drop_downs.append(self.combine)
 
     def process(self, args):
 
@@ -45,10 +64,17 @@ class AlgBody(Algorithm):
         according to a threshold value.
         To decide whether or not an edge is removed the attribute value and
         the threshold value are used together in a logical operation.
+        A second attribute predicate can be combined with the first one, an
+        edge is then removed if both ("and") or any ("or") of the predicates
+        hold.
+        The attribute values of all edges are compared at once and all
+        matching edges are removed in one bulk operation.
 
         Example: Remove all edges with length strictly smaller than 10.5
         Example: Remove all edges with width greater or equal to 5
         Example: Remove all edges with length exaclty 7
+        Example: Remove all edges with length strictly smaller than 10 and
+         width strictly smaller than 2
 
         Args:
             | *input* : a list which contains the image and the graph
@@ -58,25 +84,54 @@ class AlgBody(Algorithm):
              in the graph as an edge attribute
 
         Returns:
-            | *graph* : A filtered networkx graph
+            | *graph* : A filtered networkx graph or CompactGraph
 
         """
-        oper_str_value = self.operator.value
+        graph = args[1]
         try:
-            self.operator.value = check_operator(self.operator)
-            to_be_removed = [(u, v) for u, v, data in
-                             args[1].edges_iter(data=True)
-                             if self.operator.value(data[self.attribute.value],
-                                                    self.attribute_threshold_value.value)]
-            args[1].remove_edges_from(to_be_removed)
-            print ('discarding a total of', len(to_be_removed), 'edges ...')
+            to_be_removed = self.edge_mask(graph)
+            if isinstance(graph, CompactGraph):
+                graph.keep_edges(~to_be_removed)
+            else:
+                edges = list(graph.edges_iter())
+                graph.remove_edges_from(
+                    [edges[i] for i in np.flatnonzero(to_be_removed)])
+            print ('discarding a total of', np.count_nonzero(to_be_removed),
+                   'edges ...')
         except KeyError as kerror:
             print ('Exception caught in Edge_Attribute_Filter:' \
                    ' Filtering failed because', kerror)
             print ('is not present in the graph as an edge attribute.')
-        self.operator.value = oper_str_value
         self.result['img'] = args[0]
-        self.result['graph'] = args[1]
+        self.result['graph'] = graph
+
+    def edge_mask(self, graph):
+        """
+        Evaluate the selected predicates for all edges of the graph.
+
+        Args:
+            | *graph* : networkx graph or CompactGraph
+
+        Raises:
+            | *KeyError* : if an attribute is not present in the graph
+
+        Returns:
+            | *mask* (ndarray): True for every edge that is to be removed,
+              in the order of ``graph.edges_iter()``
+
+        """
+        mask = check_operator(self.operator)(
+            edge_attribute_column(graph, self.attribute.value),
+            self.attribute_threshold_value.value)
+        if self.second_attribute.value != "none":
+            second = check_operator(self.second_operator)(
+                edge_attribute_column(graph, self.second_attribute.value),
+                self.second_threshold_value.value)
+            if self.combine.value == "and":
+                mask &= second
+            else:
+                mask |= second
+        return mask
 
 
 if __name__ == '__main__':
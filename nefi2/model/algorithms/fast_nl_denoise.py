@@ -110,6 +110,13 @@ class AlgBody(Algorithm):
                     channels[2] = val
                 self.result['img'] = cv2.merge(channels)
 
+    def tile_halo(self):
+        """
+        Patches of the template window are compared within the search
+        window around a pixel.
+        """
+        return self.search_size.value + self.template_size.value
+
 
 if __name__ == '__main__':
     pass
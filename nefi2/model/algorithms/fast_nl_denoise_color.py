@@ -61,6 +61,13 @@ class AlgBody(Algorithm):
                                                      searchWindowSize=ss)
             self.result['img'] = result
 
+    def tile_halo(self):
+        """
+        Patches of the template window are compared within the search
+        window around a pixel.
+        """
+        return self.search_size.value + self.template_size.value
+
 
 if __name__ == '__main__':
     pass
@@ -74,6 +74,12 @@ class AlgBody(Algorithm):
                                                 self.sigmaX.value)
             self.result['img'] = cv2.merge(channels)
 
+    def tile_halo(self):
+        """
+        The Gaussian kernel reaches *kernelsize* pixels around a pixel.
+        """
+        return self.kernelsize.value
+
 
 if __name__ == '__main__':
     pass
@@ -9,20 +9,34 @@ The algorithm below was taken from NEFI1. It uses thinning C module written by
 `Adrian Neumann <https://bitbucket.org/adrian_n/thinning>`_.
 The code was adapted for NEFI2.
 """
-from nefi2.model.algorithms._alg import Algorithm
+from nefi2.model.algorithms._alg import Algorithm, DropDown
+from nefi2.model.algorithms._graph import CompactGraph, union_find_labels
+from nefi2.model.tiling import tile_boxes, tile_window
+from nefi2.model import scratch
 import cv2
-import networkx as nx
+import itertools
+import multiprocessing
 import numpy as np
 import thinning
 import sys
+import time
 import traceback
-from collections import defaultdict
-from itertools import chain
+from collections import OrderedDict
 
 
 __author__ = {"Adrian Neumann": "", "Pavel Shkadzko": "p.shkadzko@gmail.com"}
 
 
+# 8-neighbourhood offsets in the order the edge detection visits them
+NEIGHBOR_OFFSETS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                    if dx != 0 or dy != 0]
+# horizontal/vertical steps count 1, diagonal steps count sqrt 2
+NEIGHBOR_STEPS = [1.414214 if dx != 0 and dy != 0 else 1
+                  for dx, dy in NEIGHBOR_OFFSETS]
+# the offsets visiting every pair of adjacent pixels once
+FORWARD_OFFSETS = [(0, 1), (1, -1), (1, 0), (1, 1)]
+
+
 class AlgBody(Algorithm):
     """
     Guo Hall thinning implementation.
@@ -37,26 +51,191 @@ class AlgBody(Algorithm):
         Algorithm.__init__(self)
         self.name = "Guo Hall"
         self.parent = "Graph Detection"
+        self.edge_tracing = DropDown("Edge Tracing",
+                                     {"array", "breadth first", "compare",
+                                      "branches"},
+                                     "array")
+        self.drop_downs.append(self.edge_tracing)
 
     def process(self, args):
         """
         Guo Hall thinning.
         Use ```zhang_suen_node_detection()``` for node detection.
-        Use ```breadth_first_edge_detection()``` for edge detection.
+        Use ```array_edge_detection()``` or
+        ```breadth_first_edge_detection()``` for edge detection, depending on
+        the selected edge tracing engine. "compare" runs both engines and
+        reports the differences, see ```compare_edge_detection()```.
+        "branches" creates the edges from whole skeleton branches, so that
+        no degree two nodes are created between the node pixels, see
+        ```branch_edge_detection()```.
 
         Args:
             | *args* : a list of arguments, e.g. image ndarray
 
         """
         # create a skeleton
-        skeleton = thinning.guo_hall_thinning(args[0].copy())
+        skeleton = thinning.guo_hall_thinning(scratch.copy(args[0]))
         # detect nodes
         graph = zhang_suen_node_detection(skeleton)
         # detect edges
-        # graph = breadth_first_edge_detection(skeleton, gray_img, graph)
-        graph = breadth_first_edge_detection(skeleton, args[0], graph)
-        skeleton = cv2.cvtColor(skeleton, cv2.COLOR_GRAY2BGR)
-        self.result['graph'], self.result['img'] = graph, skeleton
+        edge_detection = EDGE_DETECTION_ENGINES[self.edge_tracing.value]
+        graph = edge_detection(skeleton, args[0], graph)
+        self.result['graph'], self.result['img'] = graph, to_bgr(skeleton)
+
+    def process_tiled(self, args, tile_size, jobs):
+        """
+        Guo Hall thinning and graph detection of a large image, tile by tile
+        in *jobs* worker processes. The result equals the one of
+        ```process()```.
+
+        Thinning removes one pixel layer per sub-iteration, so whether a
+        pixel stays in the skeleton depends only on the pixels in a distance
+        of at most twice the number of iterations. Every tile is thinned
+        together with a halo of that width, which is derived from the
+        largest distance transform value, see ```foreground_reach()```.
+        With the "branches" edge tracing, nodes and branch parts are
+        detected per tile as well and stitched along the tile seams by their
+        boundary pixels, see ```merge_branch_pieces()```. The other engines
+        trace the edges on the stitched skeleton.
+
+        Args:
+            | *args* : a list of arguments, e.g. image ndarray
+            | *tile_size* (int): tile length in pixels
+            | *jobs* (int): number of worker processes
+
+        """
+        segmented = args[0]
+        boxes = tile_boxes(segmented.shape, tile_size)
+        pool = multiprocessing.Pool(jobs, scratch.set_scratch,
+                                    scratch.get_scratch()) \
+            if jobs > 1 else None
+        starmap = pool.starmap if pool else \
+            lambda func, tasks: list(itertools.starmap(func, tasks))
+        try:
+            reach = foreground_reach(segmented, boxes, starmap)
+            halo = 4 * reach + 8
+            skeleton = scratch.empty(segmented.shape, np.uint8)
+            tasks = (tile_window(segmented, box, halo)[::2] for box in boxes)
+            for (top, bottom, left, right), tile in zip(
+                    boxes, starmap(thin_tile, tasks)):
+                skeleton[top:bottom, left:right] = tile
+            if self.edge_tracing.value == "branches":
+                graph = tiled_branch_detection(skeleton, segmented, boxes,
+                                               reach + 2, starmap)
+            else:
+                graph = zhang_suen_node_detection(skeleton)
+                edge_detection = \
+                    EDGE_DETECTION_ENGINES[self.edge_tracing.value]
+                graph = edge_detection(skeleton, segmented, graph)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        self.result['graph'], self.result['img'] = graph, to_bgr(skeleton)
+
+
+def to_bgr(skeleton):
+    """
+    Convert the skeleton to a color image, memory-mapped if it is large.
+    """
+    return cv2.cvtColor(skeleton, cv2.COLOR_GRAY2BGR,
+                        scratch.empty(skeleton.shape + (3,), np.uint8))
+
+
+def foreground_reach(segmented, boxes, starmap):
+    """
+    Compute the largest distance transform value of a segmented image tile
+    by tile. A tile is extended by a margin, the distance of a pixel is
+    exact if it is smaller than the margin, otherwise the tile is processed
+    again with a doubled margin.
+
+    Args:
+        | *segmented* : segmented image
+        | *boxes* : tiles as (top, bottom, left, right) tuples
+        | *starmap* : function mapping a function over argument tuples
+
+    Returns:
+        | *reach* (int): the largest distance transform value, rounded up
+
+    """
+    reach = 0
+    margin = 32
+    while boxes:
+        tasks = (tile_window(segmented, box, margin)[::2] for box in boxes)
+        results = starmap(tile_distance_max, tasks)
+        reach = max([reach] + results)
+        # a margin as large as the image leaves nothing to check
+        if margin >= max(segmented.shape[:2]):
+            break
+        boxes = [box for box, dist in zip(boxes, results) if dist >= margin]
+        margin *= 2
+    return int(np.ceil(reach))
+
+
+def tile_distance_max(window, core):
+    """
+    Return the largest distance transform value in the core of a tile.
+    """
+    top, bottom, left, right = core
+    dt = cv2.distanceTransform(window, 2, 0)
+    return float(dt[top:bottom, left:right].max(initial=0))
+
+
+def thin_tile(window, core):
+    """
+    Return the Guo Hall skeleton of the core of a tile.
+    """
+    top, bottom, left, right = core
+    return thinning.guo_hall_thinning(window.copy())[top:bottom, left:right]
+
+
+def tile_nodes(window, origin, core):
+    """
+    Return the image coordinates of the node pixels in the core of a tile,
+    see ```zhang_suen_node_detection()```.
+    """
+    top, bottom, left, right = core
+    graph = zhang_suen_node_detection(window)
+    in_core = (graph.xs >= top) & (graph.xs < bottom) & \
+        (graph.ys >= left) & (graph.ys < right)
+    return graph.xs[in_core] + origin[0], graph.ys[in_core] + origin[1]
+
+
+def tiled_branch_detection(skeleton, segmented, boxes, halo, starmap):
+    """
+    Run ```branch_edge_detection()``` tile by tile on a skeleton.
+
+    Args:
+        | *skeleton* : skeletonized image
+        | *segmented* : segmented image used to compute edge widths
+        | *boxes* : tiles as (top, bottom, left, right) tuples
+        | *halo* : halo width, larger than the largest distance transform
+          value and at least 2
+        | *starmap* : function mapping a function over argument tuples
+
+    Returns:
+        *graph* : CompactGraph object with merged nodes and branch edges
+
+    """
+    nodes = starmap(tile_nodes, (tile_window(skeleton, box, 1)
+                                 for box in boxes))
+    node_ids, node_cluster, graph = cluster_nodes(
+        np.concatenate([xs for xs, _ in nodes]),
+        np.concatenate([ys for _, ys in nodes]), skeleton.shape)
+
+    def tasks():
+        for box in boxes:
+            window, origin, core = tile_window(skeleton, box, halo)
+            # only the node pixels inside the window
+            first = np.searchsorted(node_ids, origin[0] * skeleton.shape[1])
+            last = np.searchsorted(node_ids, (origin[0] + window.shape[0]) *
+                                   skeleton.shape[1])
+            yield (window, tile_window(segmented, box, halo)[0], origin, core,
+                   node_ids[first:last], node_cluster[first:last],
+                   skeleton.shape)
+    pieces = starmap(branch_pieces, tasks())
+    merge_branch_pieces(pieces, len(graph), graph, skeleton.shape)
+    return graph
 
 
 def zhang_suen_node_detection(skel):
@@ -76,57 +255,97 @@ def zhang_suen_node_detection(skel):
     A(p1) >= 3: The pixel p1 belongs to a branching point of a skeleton line,
     thus a node of degree >=3 has been found.
 
+    A(p) is computed for all skeleton pixels at once by comparing shifted
+    views of the skeleton instead of visiting every pixel in Python.
+
     Args:
         *skel* : Skeletonised source image. The skeleton must be exactly 1
          pixel wide.
 
     Returns:
-        *graph* : networkx Graph object with detected nodes.
+        *graph* : CompactGraph object with detected nodes.
 
     """
-    def check_pixel_neighborhood(x, y, skel):
-        """
-        Check the number of components around a pixel.
-        If it is either 1 or more than 3, it is a node.
+    w, h = skel.shape
+    if w < 3 or h < 3:
+        return CompactGraph()
+    # p2, ..., p9 in the clockwise order used by Zhang and Suen, given as
+    # offsets of the 8-neighbourhood around p1
+    offsets = [(-1, 0), (-1, 1), (0, 1), (1, 1),
+               (1, 0), (1, -1), (0, -1), (-1, -1)]
+    # a neighbour counts as 1 if it is 255 and as 0 if it is 0
+    ones = skel == 255
+    zeros = skel == 0
 
-        Args:
-            | *x* : pixel location value
-            | *y* : pixel location value
-            | *skel* : skeleton Graph object
+    def shifted(arr, dx, dy):
+        return arr[1 + dx:w - 1 + dx, 1 + dy:h - 1 + dy]
 
-        Returns:
-            *accept_pixel_as_node* : boolean value
+    # The function A(p1) for all inner pixels at once: count 0 -> 1
+    # transitions in the sequence p2, p3, ..., p9, p2
+    components = np.zeros((w - 2, h - 2), np.uint8)
+    for (dx1, dy1), (dx2, dy2) in zip(offsets, offsets[1:] + offsets[:1]):
+        components += shifted(zeros, dx1, dy1) & shifted(ones, dx2, dy2)
+    is_node = (components == 1) | (components >= 3)
+    is_node &= shifted(skel, 0, 0) != 0
+    xs, ys = np.nonzero(is_node)
+    # np.nonzero returns row-major order, same as scanning x, then y
+    return CompactGraph(xs + 1, ys + 1)
 
-        """
-        accept_pixel_as_node = False
-        item = skel.item
-        p2 = item(x - 1, y) / 255
-        p3 = item(x - 1, y + 1) / 255
-        p4 = item(x, y + 1) / 255
-        p5 = item(x + 1, y + 1) / 255
-        p6 = item(x + 1, y) / 255
-        p7 = item(x + 1, y - 1) / 255
-        p8 = item(x, y - 1) / 255
-        p9 = item(x - 1, y - 1) / 255
-
-        # The function A(p1),
-        # where p1 is the pixel whose neighborhood is beeing checked
-        components = (p2 == 0 and p3 == 1) + (p3 == 0 and p4 == 1) + \
-                     (p4 == 0 and p5 == 1) + (p5 == 0 and p6 == 1) + \
-                     (p6 == 0 and p7 == 1) + (p7 == 0 and p8 == 1) + \
-                     (p8 == 0 and p9 == 1) + (p9 == 0 and p2 == 1)
-        if (components >= 3) or (components == 1):
-            accept_pixel_as_node = True
-        return accept_pixel_as_node
-
-    graph = nx.Graph()
-    w, h = skel.shape
-    item = skel.item
-    for x in range(1, w - 1):
-        for y in range(1, h - 1):
-            if item(x, y) != 0 and check_pixel_neighborhood(x, y, skel):
-                graph.add_node((x, y))
-    return graph
+
+def distance_transform_diameter(edge_trace, segmented, num_labels):
+    """
+    (dev comments from nefi1)
+    my cv2 lacks cv2.DIST_L2, it seems to have the value 2 though, so I use
+    that, same for MASK_PRECISE
+    <python3 cv2.DIST_L2 equals to 2>
+
+    Instead of collecting the diameters of every pixel per label, only the
+    per label count, sum and sum of squares are kept, so the memory needed
+    grows with the number of labels and not with the number of pixels.
+    Diameters are truncated to integers, as nefi1 did.
+
+    Args:
+        | *edge_trace* : array of pixel labels, 0 for unlabeled pixels
+        | *segmented* : segmented image
+        | *num_labels* : the largest label in *edge_trace*
+
+    Returns:
+        | *count*, *total*, *total_sq* : arrays indexed by label holding the
+          number of pixels, the sum and the sum of squares of the diameters
+
+    """
+    dt = cv2.distanceTransform(segmented, 2, 0)
+    edge_pixels = np.nonzero(edge_trace)
+    labels = edge_trace[edge_pixels]
+    diam = (2.0 * dt[edge_pixels]).astype(np.uint).astype(np.float64)
+    count = np.bincount(labels, minlength=num_labels + 1)
+    total = np.bincount(labels, diam, minlength=num_labels + 1)
+    total_sq = np.bincount(labels, diam * diam, minlength=num_labels + 1)
+    return count, total, total_sq
+
+
+def edge_width(diameters, l1, l2):
+    """
+    Compute the mean and the variance of the diameters of the pixels of two
+    labels forming an edge.
+
+    Args:
+        | *diameters* : per label statistics returned by
+          ```distance_transform_diameter()```
+        | *l1*, *l2* : label arrays of the edge ends
+
+    Returns:
+        | *width*, *width_var* : arrays with the mean and the variance
+
+    """
+    count, total, total_sq = diameters
+    n = count[l1] + count[l2]
+    sums = total[l1] + total[l2]
+    sums_sq = total_sq[l1] + total_sq[l2]
+    width = sums / n
+    # the sums are exact integers, so this does not lose precision
+    width_var = (sums_sq * n - sums * sums) / (n * n)
+    return width, width_var
 
 
 def breadth_first_edge_detection(skel, segmented, graph):
@@ -143,6 +362,15 @@ def breadth_first_edge_detection(skel, segmented, graph):
 
     The runtime is linear in the number of pixels.
     White pixels are **much more** expensive though.
+
+    Args:
+        | *skel* : skeletonized image
+        | *segmented* : segmented image used to compute edge widths
+        | *graph* : CompactGraph object with detected nodes
+
+    Returns:
+        *graph* : CompactGraph object with detected nodes and edges
+
     """
     def neighbors(x, y):
         item = skel.item
@@ -157,30 +385,18 @@ def breadth_first_edge_detection(skel, segmented, graph):
                                 item(x + dx, y + dy) != 0:
                     yield x + dx, y + dy
 
-    def distance_transform_diameter(edge_trace, segmented):
-        """
-        (dev comments from nefi1)
-        my cv2 lacks cv2.DIST_L2, it seems to have the value 2 though, so I use
-        that, same for MASK_PRECISE
-        <python3 cv2.DIST_L2 equals to 2>
-        """
-        dt = cv2.distanceTransform(segmented, 2, 0)
-        edge_pixels = np.nonzero(edge_trace)
-        diameters = defaultdict(list)
-        for label, diam in zip(edge_trace[edge_pixels], 2.0 * dt[edge_pixels]):
-            diameters[label].append(diam)
-        return diameters
-
     # compute edge length
     # initialize: the neighbor pixels of each node get a distinct label
     # each label gets a queue
-    label_node = dict()
+    starts = [(x, y, list(neighbors(x, y))) for x, y in graph.nodes_iter()]
+    num_labels = sum(len(nbs) for _, _, nbs in starts)
+    label_node = np.empty(num_labels, np.intp)
+    label_length = np.zeros(num_labels + 1, np.float64)
     queues = []
     label = 1
-    label_length = defaultdict(int)
-    for x, y in graph.nodes_iter():
-        for a, b in neighbors(x, y):
-            label_node[label] = (x, y)
+    for node, (x, y, nbs) in enumerate(starts):
+        for a, b in nbs:
+            label_node[label - 1] = node
             label_length[label] = 1.414214 if abs(x - a) == 1 and \
                                               abs(y - b) == 1 else 1
             queues.append((label, (x, y), [(a, b)]))
@@ -191,10 +407,9 @@ def breadth_first_edge_detection(skel, segmented, graph):
     # Each label grows in every phase.
     # If two labels meet, we have an edge.
     edges = set()
-    edge_trace = np.zeros(skel.shape, np.uint32)
+    edge_trace = scratch.zeros(skel.shape, label_dtype(num_labels))
     edge_value = edge_trace.item
     edge_set_value = edge_trace.itemset
-    label_histogram = defaultdict(int)
 
     while queues:
         new_queues = []
@@ -203,7 +418,6 @@ def breadth_first_edge_detection(skel, segmented, graph):
                 value = edge_value(ix, iy)
                 if value == 0:
                     edge_set_value((ix, iy), label)
-                    label_histogram[label] += 1
                     # TODO consider using cv2.arcLength for this
                     label_length[label] += 1.414214 if abs(ix - px) == 1 and \
                                                        abs(iy - py) == 1 else 1
@@ -212,21 +426,571 @@ def breadth_first_edge_detection(skel, segmented, graph):
                     edges.add((min(label, value), max(label, value)))
         queues = new_queues
 
-    # compute edge diameters
-    diameters = distance_transform_diameter(edge_trace, segmented)
-    # add edges to graph
-    for l1, l2 in edges:
-        u, v = label_node[l1], label_node[l2]
-        if u == v:
-            continue
-        d1, d2 = diameters[l1], diameters[l2]
-        diam = np.fromiter(chain(d1, d2), np.uint, len(d1) + len(d2))
-        graph.add_edge(u, v, pixels=label_histogram[l1] + label_histogram[l2],
-                       length=label_length[l1] + label_length[l2],
-                       width=np.mean(diam),
-                       width_var=np.var(diam))
+    # compute edge diameters, the pixel count of a label is its histogram
+    diameters = distance_transform_diameter(edge_trace, segmented, num_labels)
+    edges = np.array(list(edges), np.int64).reshape(-1, 2)
+    add_label_edges(graph, label_node, edges[:, 0], edges[:, 1], diameters,
+                    label_length)
+    return graph
+
+
+def label_dtype(num_labels):
+    """
+    Return the smallest unsigned integer type holding the labels
+    0, ..., *num_labels*, so that the full-size label arrays of the edge
+    detection use as little memory as possible.
+    """
+    return np.min_scalar_type(num_labels)
+
+
+def met_pair_order(low, high):
+    """
+    Return the label pairs that met in the order nefi1 added them to the
+    graph. nefi1 collected the pairs in a set while they met and added them
+    in the iteration order of that set, which depends on the order the pairs
+    were inserted in.
+
+    Args:
+        | *low*, *high* : arrays of the label pairs in the order they met,
+          with *low* < *high* and repeated pairs
+
+    Returns:
+        | *low*, *high* : arrays of the unique pairs in set order
+
+    """
+    pairs = set()
+    for pair in zip(low.tolist(), high.tolist()):
+        pairs.add(pair)
+    pairs = np.array(list(pairs), np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def add_label_edges(graph, label_node, low, high, diameters, label_length):
+    """
+    Add the edges found by ```breadth_first_edge_detection()``` and
+    ```array_edge_detection()``` to the graph, skipping self loops.
+    Label pairs connecting the same two nodes are merged as in nefi1, which
+    added the pairs to a networkx graph one after the other: the edge is
+    placed at the first pair and gets the properties of the last one.
+
+    Args:
+        | *graph* : CompactGraph object with detected nodes
+        | *label_node* : array with the node index of every label, label 1
+          first
+        | *low*, *high* : arrays of the label pairs that met, with
+          *low* < *high*, in the order nefi1 added them, see
+          ```met_pair_order()```
+        | *diameters* : per label statistics returned by
+          ```distance_transform_diameter()```
+        | *label_length* : array with the length of every label, indexed by
+          label
+
+    """
+    src, dst = label_node[low - 1], label_node[high - 1]
+    loop = src == dst
+    low, high, src, dst = low[~loop], high[~loop], src[~loop], dst[~loop]
+    node_pair = np.minimum(src, dst) * len(graph) + np.maximum(src, dst)
+    _, first, pair_index = np.unique(node_pair, return_index=True,
+                                     return_inverse=True)
+    last = np.zeros(len(first), np.intp)
+    np.maximum.at(last, pair_index.reshape(-1), np.arange(len(node_pair)))
+    order = np.argsort(first)
+    first, last = first[order], last[order]
+    low, high = low[last], high[last]
+    count = diameters[0]
+    width, width_var = edge_width(diameters, low, high)
+    graph.src = src[first].astype(np.intp)
+    graph.dst = dst[first].astype(np.intp)
+    graph.edge_attrs = OrderedDict([
+        ('pixels', count[low] + count[high]),
+        ('length', label_length[low] + label_length[high]),
+        ('width', width),
+        ('width_var', width_var)])
+
+
+def array_edge_detection(skel, segmented, graph):
+    """
+    Detect edges in the skeletonized image.
+    Array based equivalent of ```breadth_first_edge_detection()```, which
+    computes the same *pixels*, *length*, *width* and *width_var* edge
+    properties.
+
+    Pixels are addressed by their index into a flattened, zero padded copy of
+    the skeleton, so that the 8-neighbourhood of a pixel is a fixed set of
+    index offsets and no bounds checks are needed. Each phase of the breadth
+    first search handles the whole frontier as one array: the first
+    candidate in queue order claims a free pixel, every other candidate for
+    an already claimed pixel of a different label yields an edge.
+
+    Args:
+        | *skel* : skeletonized image
+        | *segmented* : segmented image used to compute edge widths
+        | *graph* : CompactGraph object with detected nodes
+
+    Returns:
+        *graph* : CompactGraph object with detected nodes and edges
+
+    """
+    width, height = skel.shape
+    stride = height + 2
+    padded = scratch.zeros((width + 2, height + 2), np.bool_)
+    padded[1:-1, 1:-1] = skel != 0
+    is_white = padded.ravel()
+    offsets = np.array([dx * stride + dy for dx, dy in NEIGHBOR_OFFSETS],
+                       np.intp)
+    steps = np.array(NEIGHBOR_STEPS, np.float64)
+
+    # initialize: the neighbor pixels of each node get a distinct label
+    node_pixels = ((graph.xs + 1) * stride + graph.ys + 1).astype(np.intp)
+    candidates = node_pixels[:, None] + offsets
+    white = is_white[candidates]
+    cand_pixel = candidates[white]
+    cand_step = np.broadcast_to(steps, candidates.shape)[white]
+    label_node = np.broadcast_to(np.arange(len(node_pixels))[:, None],
+                                 candidates.shape)[white]
+    num_labels = len(cand_pixel)
+    dtype = label_dtype(num_labels)
+    cand_label = np.arange(1, num_labels + 1, dtype=dtype)
+    label_length = np.zeros(num_labels + 1, np.float64)
+    label_length[1:] = cand_step
+
+    # bfs over the white pixels, one phase per loop iteration
+    edge_trace = scratch.zeros(padded.shape, dtype)
+    trace = edge_trace.ravel()
+    met_labels = []
+    while cand_pixel.size:
+        # pixels claimed in an earlier phase by another label
+        value = trace[cand_pixel]
+        met = np.flatnonzero((value != 0) & (value != cand_label))
+        met_value = value[met]
+        # free pixels are claimed by their first candidate in queue order
+        free = np.flatnonzero(value == 0)
+        _, first = np.unique(cand_pixel[free], return_index=True)
+        claimed = free[np.sort(first)]
+        trace[cand_pixel[claimed]] = cand_label[claimed]
+        # the other candidates of a pixel claimed in this phase
+        value = trace[cand_pixel[free]]
+        later = value != cand_label[free]
+        # the pairs of the phase in queue order, as the BFS meets them
+        met = np.concatenate([met, free[later]])
+        met_value = np.concatenate([met_value, value[later]])
+        order = np.argsort(met, kind='stable')
+        met_labels.append((met_value[order], cand_label[met[order]]))
+        # grow the labels
+        claimed_label = cand_label[claimed]
+        label_length += np.bincount(claimed_label, cand_step[claimed],
+                                    minlength=num_labels + 1)
+        # the white neighbors of the claimed pixels form the next phase
+        candidates = cand_pixel[claimed][:, None] + offsets
+        white = is_white[candidates]
+        cand_pixel = candidates[white]
+        cand_step = np.broadcast_to(steps, candidates.shape)[white]
+        cand_label = np.broadcast_to(claimed_label[:, None],
+                                     candidates.shape)[white]
+
+    # label pairs (l1, l2) with l1 < l2 in the order they met, repeated
+    # pairs only count where they met first
+    low = np.concatenate([np.minimum(a, b) for a, b in met_labels] +
+                         [np.zeros(0, dtype)]).astype(np.int64)
+    high = np.concatenate([np.maximum(a, b) for a, b in met_labels] +
+                          [np.zeros(0, dtype)]).astype(np.int64)
+    _, first = np.unique(low * (num_labels + 1) + high, return_index=True)
+    first = np.sort(first)
+    low, high = met_pair_order(low[first], high[first])
+
+    # compute edge diameters, the pixel count of a label is its histogram
+    diameters = distance_transform_diameter(edge_trace[1:-1, 1:-1], segmented,
+                                            num_labels)
+    add_label_edges(graph, label_node, low, high, diameters, label_length)
     return graph
 
 
+def branch_edge_detection(skel, segmented, graph):
+    """
+    Detect edges as whole skeleton branches, so that no degree two nodes
+    are created between the node pixels.
+
+    Adjacent node pixels are merged into one node placed at the pixel
+    closest to their center. The remaining skeleton pixels are split into
+    branches, the 8-connected components of non-node pixels. A branch
+    becomes an edge between every two of the nodes it touches, usually the
+    two nodes at its ends. A branch touching more nodes, e.g. at a junction
+    missed by the node detection, connects all of them. The edges have the
+    properties:
+
+        | *pixels* : number of pixels of the branch
+        | *length* : length in pixels of the branch and the steps to the
+           two nodes, horizontal/vertikal steps count 1, diagonal steps
+           count sqrt 2
+        | *width* : the mean diameter of the branch
+        | *width_var* : the variance of the width along the branch
+
+    Branches touching less than two nodes, e.g. closed loops, loops
+    returning to their node or lines ending at the image border, are
+    dropped like the self loops of the other engines.
+    As in "Smooth 2 Nodes", an edge parallel to an earlier one keeps a node
+    at its branch pixel next to the second node. This node is joined to
+    the second node by an edge without pixels.
+
+    The graph is not the one of the other engines followed by
+    "Smooth 2 Nodes": adjacent node pixels are one node here, and nodes
+    joining only two branches are not smoothed.
+
+    The image is processed as a single tile, see ```branch_pieces()```.
+
+    Args:
+        | *skel* : skeletonized image
+        | *segmented* : segmented image used to compute edge widths
+        | *graph* : CompactGraph object with detected nodes
+
+    Returns:
+        *graph* : CompactGraph object with merged nodes and branch edges
+
+    """
+    width, height = skel.shape
+    node_ids, node_cluster, result = cluster_nodes(graph.xs, graph.ys,
+                                                   skel.shape)
+    pieces = branch_pieces(skel, segmented, (0, 0), (0, width, 0, height),
+                           node_ids, node_cluster, skel.shape)
+    merge_branch_pieces([pieces], len(result), result, skel.shape)
+    return result
+
+
+def cluster_nodes(xs, ys, shape):
+    """
+    Merge adjacent node pixels into node clusters.
+
+    Args:
+        | *xs*, *ys* : node pixel coordinates
+        | *shape* : image shape
+
+    Returns:
+        | *node_ids* : row-major pixel indices of the node pixels, sorted
+        | *node_cluster* : cluster of every node pixel in *node_ids*,
+          clusters are numbered in the order of their first pixel
+        | *graph* : CompactGraph object with one node per cluster placed at
+          the pixel closest to the cluster center
+
+    """
+    node_ids = np.asarray(xs, np.int64) * shape[1] + ys
+    order = np.argsort(node_ids, kind='stable')
+    node_ids = node_ids[order]
+    xs, ys = np.divmod(node_ids, shape[1])
+    if not len(node_ids):
+        return node_ids, np.zeros(0, np.intp), CompactGraph()
+    # pairs of adjacent node pixels, each pair once
+    pair_src, pair_dst = [], []
+    for dx, dy in FORWARD_OFFSETS:
+        other = node_ids + dx * shape[1] + dy
+        pos = np.minimum(np.searchsorted(node_ids, other), len(node_ids) - 1)
+        found = (node_ids[pos] == other) & (ys + dy >= 0) & \
+            (ys + dy < shape[1])
+        pair_src.append(np.flatnonzero(found))
+        pair_dst.append(pos[found])
+    cluster = union_find_labels(len(node_ids), np.concatenate(pair_src),
+                                np.concatenate(pair_dst))
+    num_clusters = cluster.max() + 1
+
+    # place every node at its pixel closest to the cluster center
+    size = np.bincount(cluster, minlength=num_clusters)
+    center_x = np.bincount(cluster, xs, num_clusters) / size
+    center_y = np.bincount(cluster, ys, num_clusters) / size
+    dist = (xs - center_x[cluster]) ** 2 + (ys - center_y[cluster]) ** 2
+    order = np.lexsort((dist, cluster))
+    closest = order[np.flatnonzero(np.diff(cluster[order], prepend=-1))]
+    return node_ids, cluster, CompactGraph(xs[closest], ys[closest])
+
+
+def branch_pieces(skel, segmented, origin, core, node_ids, node_cluster,
+                  shape):
+    """
+    Compute the parts of the skeleton branches lying in the core of a tile.
+    Only the pixels of the core and the pairs of adjacent pixels starting in
+    the core are counted, so every pixel and every pair is counted by
+    exactly one tile. The tile needs a halo of at least 2 pixels around the
+    core, where the image is not bordering.
+    Branches are labeled locally, the pixels at the core border and next to
+    it link the local labels of neighboring tiles, see
+    ```merge_branch_pieces()```.
+
+    Args:
+        | *skel* : skeletonized image of the tile with its halo
+        | *segmented* : segmented image of the tile with its halo, the halo
+          has to be wider than the largest distance transform value
+        | *origin* : (x, y) position of the tile with its halo in the image
+        | *core* : (top, bottom, left, right) bounds of the core in the tile
+        | *node_ids*, *node_cluster* : node pixels and their clusters, see
+          ```cluster_nodes()```
+        | *shape* : image shape
+
+    Returns:
+        | *pieces* : tuple of per label arrays *count*, *total*,
+          *total_sq*, *length*, *first_pixel*, the arrays *link_ids*,
+          *link_labels* of linking pixels and their labels and the arrays
+          *touch_label*, *touch_node*, *touch_step*, *touch_pixel*,
+          *touch_diam* of the nodes touched by the labels, the branch pixels
+          next to them and their diameters
+
+    """
+    width, height = skel.shape
+    stride = height + 2
+    padded = scratch.zeros((width + 2, height + 2), np.bool_)
+    padded[1:-1, 1:-1] = skel != 0
+    is_white = padded.ravel()
+    pixels = np.flatnonzero(is_white)
+    xs, ys = np.divmod(pixels, stride)
+    xs, ys = xs - 1, ys - 1
+    pixel_ids = (xs + origin[0]) * np.int64(shape[1]) + ys + origin[1]
+    pixel_index = scratch.zeros(padded.size, np.intp)
+    pixel_index[pixels] = np.arange(len(pixels))
+    pixel_cluster = np.full(len(pixels), -1, np.intp)
+    if len(node_ids):
+        pos = np.minimum(np.searchsorted(node_ids, pixel_ids),
+                         len(node_ids) - 1)
+        found = node_ids[pos] == pixel_ids
+        pixel_cluster[found] = node_cluster[pos[found]]
+    node_pixels = pixel_cluster >= 0
+    is_node = scratch.zeros(padded.size, np.bool_)
+    is_node[pixels[node_pixels]] = True
+    top, bottom, left, right = core
+    in_core = (xs >= top) & (xs < bottom) & (ys >= left) & (ys < right)
+
+    # pairs of adjacent white pixels starting in the core, each pair once
+    core_pixels = pixels[in_core]
+    pair_src, pair_dst, pair_step = [], [], []
+    for dx, dy in FORWARD_OFFSETS:
+        other = core_pixels + dx * stride + dy
+        white = is_white[other]
+        pair_src.append(core_pixels[white])
+        pair_dst.append(other[white])
+        pair_step.append(np.full(np.count_nonzero(white),
+                                 1.414214 if dx != 0 and dy != 0 else 1,
+                                 np.float64))
+    pair_src = np.concatenate(pair_src)
+    pair_dst = np.concatenate(pair_dst)
+    pair_step = np.concatenate(pair_step)
+    a, b = pixel_index[pair_src], pixel_index[pair_dst]
+    src_node, dst_node = node_pixels[a], node_pixels[b]
+    inner = ~src_node & ~dst_node
+    touch = src_node != dst_node
+
+    # the nodes next to the pixels of the core and one pixel around it
+    first_node = np.full(len(pixels), np.iinfo(np.intp).max, np.intp)
+    last_node = np.full(len(pixels), -1, np.intp)
+    near = np.flatnonzero((xs >= top - 1) & (xs <= bottom) &
+                          (ys >= left - 1) & (ys <= right))
+    for dx, dy in NEIGHBOR_OFFSETS:
+        other = pixels[near] + dx * stride + dy
+        next_to_node = is_node[other]
+        index = near[next_to_node]
+        node = pixel_cluster[pixel_index[other[next_to_node]]]
+        first_node[index] = np.minimum(first_node[index], node)
+        last_node[index] = np.maximum(last_node[index], node)
+
+    # branches are the components of adjacent non-node pixels. Two pixels
+    # next to the same node start different branches leaving that node,
+    # e.g. at a junction, so they are not joined
+    shared = (first_node[a] == first_node[b]) | \
+        (first_node[a] == last_node[b]) | \
+        (last_node[a] == first_node[b]) | (last_node[a] == last_node[b])
+    inner &= ~(shared & (last_node[a] >= 0) & (last_node[b] >= 0))
+    labels = union_find_labels(len(pixels), a[inner], b[inner])
+    # only the branch pixels of the core and the pixels paired with them
+    used = in_core.copy()
+    used[b] = True
+    used &= ~node_pixels
+    label_ids, label = np.unique(labels[used], return_inverse=True)
+    num_labels = len(label_ids)
+    pixel_label = np.full(len(pixels), -1, np.intp)
+    pixel_label[used] = label.reshape(-1)
+
+    # branch length: the steps between adjacent branch pixels, without the
+    # diagonal steps that cut the corner of two orthogonal steps
+    is_branch = is_white & ~is_node
+    diagonal = pair_step != 1
+    row, col = np.divmod(pair_dst - pair_src + stride + 1, stride)
+    corner = is_branch[pair_src + (row - 1) * stride] | \
+        is_branch[pair_src + col - 1]
+    inner &= ~(diagonal & corner)
+    length = np.bincount(pixel_label[a[inner]], pair_step[inner],
+                         num_labels).astype(np.float64)
+
+    # the branch pixels next to a node and the touched node
+    touch_index = np.where(src_node, b, a)[touch]
+    touch_label = pixel_label[touch_index]
+    touch_node = pixel_cluster[np.where(src_node, a, b)[touch]]
+    touch_step = pair_step[touch]
+
+    # diameters of the branch pixels in the core, truncated to integers
+    # as ```distance_transform_diameter()``` does
+    core_branch = in_core & ~node_pixels
+    dt = cv2.distanceTransform(segmented, 2, 0)
+    diam = (2.0 * dt[xs, ys]).astype(np.uint).astype(np.float64)
+    touch_diam = diam[touch_index]
+    diam = diam[core_branch]
+    label = pixel_label[core_branch]
+    count = np.bincount(label, minlength=num_labels)
+    total = np.bincount(label, diam, num_labels)
+    total_sq = np.bincount(label, diam * diam, num_labels)
+    first_pixel = np.full(num_labels, np.iinfo(np.int64).max, np.int64)
+    np.minimum.at(first_pixel, label, pixel_ids[core_branch])
+
+    # the core border and the halo pixels link to the neighboring tiles
+    link = used & ~((xs > top) & (xs < bottom - 1) &
+                    (ys > left) & (ys < right - 1))
+    return (count, total, total_sq, length, first_pixel, pixel_ids[link],
+            pixel_label[link], touch_label, touch_node, touch_step,
+            pixel_ids[touch_index], touch_diam)
+
+
+def merge_branch_pieces(all_pieces, num_clusters, graph, shape):
+    """
+    Stitch the branch parts computed by ```branch_pieces()``` for the tiles
+    of an image. Local labels sharing a linking pixel belong to the same
+    branch. The branches are added to the graph as edges between the nodes
+    they touch, see ```branch_edge_detection()```.
+
+    Args:
+        | *all_pieces* : list of ```branch_pieces()``` results
+        | *num_clusters* : number of node clusters
+        | *graph* : CompactGraph object with one node per cluster
+        | *shape* : image shape
+
+    """
+    columns = [np.concatenate(column) for column in zip(*all_pieces)]
+    count, total, total_sq, length, first_pixel = columns[:5]
+    link_ids, link_labels, touch_label, touch_node, touch_step = columns[5:10]
+    touch_pixel, touch_diam = columns[10:]
+    # local labels are made unique by the label offset of their tile
+    offsets = np.cumsum([0] + [len(pieces[0]) for pieces in all_pieces])
+    link_labels = link_labels + np.repeat(
+        offsets[:-1], [len(pieces[6]) for pieces in all_pieces])
+    touch_label = touch_label + np.repeat(
+        offsets[:-1], [len(pieces[7]) for pieces in all_pieces])
+    order = np.argsort(link_ids, kind='stable')
+    link_ids, link_labels = link_ids[order], link_labels[order]
+    same = link_ids[1:] == link_ids[:-1]
+    branch = union_find_labels(offsets[-1], link_labels[:-1][same],
+                               link_labels[1:][same])
+    # number the branches in the order of their first pixel
+    num_branches = branch.max() + 1 if len(branch) else 0
+    branch_first = np.full(num_branches, np.iinfo(np.int64).max, np.int64)
+    np.minimum.at(branch_first, branch, first_pixel)
+    rank = np.empty(num_branches, np.intp)
+    rank[np.argsort(branch_first, kind='stable')] = np.arange(num_branches)
+    branch = rank[branch]
+    count, total, total_sq, length = [
+        np.bincount(branch, arr, num_branches)
+        for arr in (count, total, total_sq, length)]
+
+    # the nodes touched by a branch and the shortest step to each of them,
+    # the pixel breaks ties so that the result does not depend on the tiles
+    touch_branch = branch[touch_label]
+    order = np.lexsort((touch_pixel, touch_step, touch_node, touch_branch))
+    first = order[np.flatnonzero(np.diff(
+        touch_branch[order] * num_clusters + touch_node[order],
+        prepend=-1))]
+    touch_branch, touch_node, touch_step, touch_pixel, touch_diam = [
+        arr[first] for arr in (touch_branch, touch_node, touch_step,
+                               touch_pixel, touch_diam)]
+    num_touched = np.bincount(touch_branch, minlength=num_branches)
+
+    # a branch becomes an edge between every two of the nodes it touches,
+    # the touches of a branch are sorted by node
+    partners = np.cumsum(num_touched)[touch_branch] - \
+        np.arange(len(touch_branch)) - 1
+    src_touch = np.repeat(np.arange(len(touch_branch)), partners)
+    dst_touch = src_touch + 1 + np.arange(len(src_touch)) - \
+        np.repeat(np.cumsum(partners) - partners, partners)
+    edge_branch = touch_branch[src_touch]
+    src, dst = touch_node[src_touch], touch_node[dst_touch]
+    count, total, total_sq = [arr[edge_branch]
+                              for arr in (count, total, total_sq)]
+    length = length[edge_branch] + touch_step[src_touch] + \
+        touch_step[dst_touch]
+
+    # like "Smooth 2 Nodes", an edge parallel to an earlier one keeps a node
+    # at its pixel next to the second node. Its pixel is shared by all
+    # edges of the branch ending there
+    _, first = np.unique(src * num_clusters + dst, return_index=True)
+    parallel = np.ones(len(src), np.bool_)
+    parallel[first] = False
+    new_touch, new_node = np.unique(dst_touch[parallel], return_inverse=True)
+    dst[parallel] = num_clusters + new_node.reshape(-1)
+    diam = touch_diam[dst_touch[parallel]]
+    count[parallel] -= 1
+    total[parallel] -= diam
+    total_sq[parallel] -= diam * diam
+    length[parallel] -= touch_step[dst_touch[parallel]]
+    node_xs, node_ys = np.divmod(touch_pixel[new_touch], shape[1])
+    graph.xs = np.concatenate([graph.xs, node_xs])
+    graph.ys = np.concatenate([graph.ys, node_ys])
+    graph.src = np.concatenate([src, num_clusters +
+                                np.arange(len(new_touch))]).astype(np.intp)
+    graph.dst = np.concatenate([dst, touch_node[new_touch]]).astype(np.intp)
+    count = np.concatenate([count, np.zeros(len(new_touch))])
+    total = np.concatenate([total, touch_diam[new_touch]])
+    total_sq = np.concatenate([total_sq, touch_diam[new_touch] ** 2])
+    length = np.concatenate([length, touch_step[new_touch]])
+    # edges without branch pixels get the diameter of their new node
+    diam = np.concatenate([np.zeros(len(src)), touch_diam[new_touch]])
+    diam[np.flatnonzero(parallel)] = touch_diam[dst_touch[parallel]]
+    empty = count == 0
+    size = np.where(empty, 1, count)
+    graph.edge_attrs = OrderedDict([
+        ('pixels', count.astype(np.int64)),
+        ('length', length),
+        ('width', np.where(empty, diam, total / size)),
+        ('width_var', np.where(empty, 0.0,
+                               (total_sq * size - total * total) /
+                               (size * size)))])
+
+
+def compare_edge_detection(skel, segmented, graph):
+    """
+    Run ```array_edge_detection()``` and ```breadth_first_edge_detection()```
+    side by side on copies of the node graph, print their runtimes and every
+    difference between the resulting edges and edge properties.
+
+    Args:
+        | *skel* : skeletonized image
+        | *segmented* : segmented image used to compute edge widths
+        | *graph* : CompactGraph object with detected nodes
+
+    Returns:
+        *graph* : the graph computed by ```array_edge_detection()```
+
+    """
+    results = []
+    for engine in (breadth_first_edge_detection, array_edge_detection):
+        start = time.time()
+        results.append(engine(skel, segmented, graph.copy()))
+        print(engine.__name__, 'took', round(time.time() - start, 3), 's')
+    bfs_graph, array_graph = [result.to_networkx() for result in results]
+    mismatches = 0
+    for u, v, data in bfs_graph.edges_iter(data=True):
+        if not array_graph.has_edge(u, v):
+            print('edge', (u, v), 'missing in array_edge_detection')
+            mismatches += 1
+            continue
+        other = array_graph.get_edge_data(u, v)
+        for key, value in data.items():
+            if not np.isclose(value, other[key]):
+                print('edge', (u, v), key, value, '!=', other[key])
+                mismatches += 1
+    for u, v in array_graph.edges_iter():
+        if not bfs_graph.has_edge(u, v):
+            print('edge', (u, v), 'missing in breadth_first_edge_detection')
+            mismatches += 1
+    print('edge detection engines differ in', mismatches, 'places')
+    return results[1]
+
+
+EDGE_DETECTION_ENGINES = {"array": array_edge_detection,
+                          "breadth first": breadth_first_edge_detection,
+                          "compare": compare_edge_detection,
+                          "branches": branch_edge_detection}
+
+
 if __name__ == '__main__':
     pass
@@ -54,6 +54,12 @@ class AlgBody(Algorithm):
                 channels[2] = (255-channels[2])
             self.result['img'] = cv2.merge(channels)
 
+    def tile_halo(self):
+        """
+        Every pixel is inverted on its own.
+        """
+        return 0
+
 
 if __name__ == '__main__':
     pass
@@ -7,7 +7,9 @@ and keeps only the largest of them, e.g remove all connected components except
 the 4 largest.
 """
 from nefi2.model.algorithms._alg import Algorithm
+from nefi2.model.algorithms._graph import CompactGraph
 import networkx as nx
+import numpy as np
 
 __author__ = {
     "Andreas Firczynski": "andreasfir91@googlemail.com",
@@ -41,14 +43,20 @@ class AlgBody(Algorithm):
               of components not to be removed is negative.
 
         Returns:
-            | *graph* : a filtered networkx Graph
+            | *graph* : a filtered networkx Graph or CompactGraph
 
         """
         image_arr, graph = args[0:2]
         try:
-            graph = max(nx.connected_component_subgraphs(graph), key=len)
-            # supposedly slower
-            # graph = list(nx.connected_components(graph))[0]
+            # label the components instead of copying each one into a
+            # subgraph, then remove all other components at once
+            if isinstance(graph, CompactGraph):
+                labels = graph.component_labels()
+                graph.keep_nodes(labels == np.argmax(np.bincount(labels)))
+            else:
+                largest = max(nx.connected_components(graph), key=len)
+                graph.remove_nodes_from([node for node in graph.nodes()
+                                         if node not in largest])
         except ValueError as e:
             print('ValueError exception:', e)
         self.result['graph'], self.result['img'] = graph, image_arr
@@ -63,6 +63,12 @@ class AlgBody(Algorithm):
                                              self.kernelsize.value*2+1)
             self.result['img'] = cv2.merge(channels)
 
+    def tile_halo(self):
+        """
+        The median is taken over *kernelsize* pixels around a pixel.
+        """
+        return self.kernelsize.value
+
 
 if __name__ == '__main__':
     pass
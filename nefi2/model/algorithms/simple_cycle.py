@@ -9,6 +9,7 @@ articulation points, or cut vertices. The removal of articulation points will
 increase the number of connected components of the graph.
 """
 from nefi2.model.algorithms._alg import Algorithm
+from nefi2.model.algorithms._graph import to_networkx, like_input
 import networkx as nx
 import cv2 as cv
 import numpy as np
@@ -43,7 +44,7 @@ class AlgBody(Algorithm):
             | *args* : a list containing image array and Graph object
 
         """
-        image, graph = args[0:2]
+        image, graph = args[0], to_networkx(args[1])
         # create a set of all nodes
         nodes_not_in_a_cycle = set(graph.nodes())
         # filter all nodes which are not in a biconnected component
@@ -54,7 +55,7 @@ class AlgBody(Algorithm):
         # the graph
         graph.remove_nodes_from(nodes_not_in_a_cycle)
         print ('discarding a total of', len(nodes_not_in_a_cycle), 'edges ...')
-        self.result['graph'] = graph
+        self.result['graph'] = like_input(graph, args[1])
         self.result['img'] = image
 
     @staticmethod
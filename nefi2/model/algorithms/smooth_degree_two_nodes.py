@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from nefi2.model.algorithms._alg import Algorithm
+from nefi2.model.algorithms._alg import Algorithm, DropDown
 from nefi2.model.algorithms._utility import draw_graph
+from nefi2.model.algorithms._graph import to_networkx, to_compact, \
+    like_input, union_find_labels
 import sys
 import networkx as nx
+import numpy as np
 
 
 __authors__ = {"Martino Bruni": "bruni.martino92@gmail.com"}
@@ -19,10 +22,14 @@ class AlgBody(Algorithm):
         Instance vars:
             | *name* : name of the algorithm
             | *parent* : name of the appropriated category
+            | *mode* : "pairwise" smooths one node after the other,
+             "chains" contracts whole chains of degree two nodes at once
         """
         Algorithm.__init__(self)
         self.name = "Smooth 2 Nodes"
         self.parent = "Graph Filtering"
+        self.mode = DropDown("Mode", {"pairwise", "chains"}, "pairwise")
+        self.drop_downs.append(self.mode)
 
     def process(self, args):
 
@@ -33,30 +40,44 @@ class AlgBody(Algorithm):
         the individual lengths.
         Widths are combined using the mean. The new edge width will be the
         mean of the individual widths.
+        In "chains" mode every maximal path of degree two nodes is replaced
+        by a single edge in one pass, see ```contract_chains()```.
 
         Args:
             | *input* : A list which contains the image and the graph
         Returns:
-            | *graph* : A filtered networkx graph
+            | *graph* : A filtered networkx graph or CompactGraph
         """
+        if self.mode.value == "chains":
+            graph = to_compact(args[1])
+            try:
+                print ('Smoothed a total of', contract_chains(graph),
+                       'degree 2 nodes ...')
+            except:
+                print ("Unexpected error:", sys.exc_info()[0])
+            self.result['img'] = args[0]
+            self.result['graph'] = like_input(graph, args[1])
+            return
+
+        graph = to_networkx(args[1])
         try:
 
-            degree_two_nodes = [v for v in args[1].nodes_iter()
-                                if args[1].degree(v) == 2]
+            degree_two_nodes = [v for v in graph.nodes_iter()
+                                if graph.degree(v) == 2]
 
-            nodes_removed = []
+            nodes_removed = set()
 
             for n in degree_two_nodes:
 
                 old_edges_data = []
                 new_edge_data = {}
 
-                neighbors = args[1].neighbors(n)
+                neighbors = graph.neighbors(n)
                 n1 = neighbors[0]
                 n2 = neighbors[1]
 
-                for e in args[1].edges(n):
-                    old_edges_data.append(args[1].get_edge_data(*e))
+                for e in graph.edges(n):
+                    old_edges_data.append(graph.get_edge_data(*e))
 
                 for d in old_edges_data:
 
@@ -91,10 +112,10 @@ class AlgBody(Algorithm):
                     / (sample_size_1 + sample_size_2 - 2)
 
                 # prevent smoothing if it results in parallel edges
-                if not args[1].has_edge(n1, n2) and n not in nodes_removed:
-                    args[1].add_edge(n1, n2, new_edge_data)
-                    args[1].remove_node(n)
-                    nodes_removed.append(n)
+                if not graph.has_edge(n1, n2) and n not in nodes_removed:
+                    graph.add_edge(n1, n2, new_edge_data)
+                    graph.remove_node(n)
+                    nodes_removed.add(n)
 
             print ('Smoothed a total of', len(
                 nodes_removed), 'degree 2 nodes ...')
@@ -104,7 +125,167 @@ class AlgBody(Algorithm):
             print ("Unexpected error:", sys.exc_info()[0])
 
         self.result['img'] = args[0]
-        self.result['graph'] = args[1]
+        self.result['graph'] = like_input(graph, args[1])
+
+
+def find_chains(graph, pinned):
+    """
+    Group the edges of a graph into maximal paths of degree two nodes
+    (chains) with one union-find pass over the edge arrays.
+
+    Args:
+        | *graph* : CompactGraph
+        | *pinned* (ndarray): bool mask of degree two nodes which end chains
+          like nodes of other degrees
+
+    Returns:
+        | *inner_nodes*, *inner_edges*, *chains* : the inner nodes of all
+          chains, the two edges of every inner node and the chain label of
+          every edge
+        | *candidates* (ndarray): labels of the chains with two end nodes
+          and more than one edge
+        | *node_a*, *node_b* (ndarray): the end nodes of the candidates
+        | *edge_a*, *edge_b* (ndarray): the candidate edges at these ends
+
+    """
+    num_edges = graph.number_of_edges()
+    degree = graph.degree()
+    ends = np.concatenate([graph.src, graph.dst])
+    edge_ids = np.tile(np.arange(num_edges), 2)
+    inner = (degree[ends] == 2) & ~pinned[ends]
+    # the two edges of every degree two node, grouped by node
+    order = np.argsort(ends[inner], kind='stable')
+    inner_nodes = ends[inner][order][::2]
+    inner_edges = edge_ids[inner][order].reshape(-1, 2)
+    # edges sharing a degree two node belong to the same chain
+    chains = union_find_labels(num_edges, inner_edges[:, 0],
+                               inner_edges[:, 1])
+    num_chains = chains.max() + 1
+    edge_count = np.bincount(chains, minlength=num_chains)
+
+    # the end nodes of a chain are the ends of its edges that are not
+    # degree two nodes, closed cycles have none
+    outer_chains = chains[edge_ids[~inner]]
+    order = np.argsort(outer_chains, kind='stable')
+    outer_nodes = ends[~inner][order]
+    outer_edges = edge_ids[~inner][order]
+    end_count = np.bincount(outer_chains, minlength=num_chains)
+    first_end = np.cumsum(end_count) - end_count
+    candidates = np.flatnonzero((edge_count > 1) & (end_count == 2))
+    node_a = outer_nodes[first_end[candidates]]
+    node_b = outer_nodes[first_end[candidates] + 1]
+    edge_a = outer_edges[first_end[candidates]]
+    edge_b = outer_edges[first_end[candidates] + 1]
+    return inner_nodes, inner_edges, chains, candidates, node_a, node_b, \
+        edge_a, edge_b
+
+
+def allowed_chains(graph, chains, candidates, node_a, node_b):
+    """
+    Select the candidate chains whose new edge would neither be a self loop
+    nor parallel to an existing edge. Of several chains between the same
+    end nodes only the first one is selected.
+
+    Args:
+        | *graph* : CompactGraph
+        | *chains*, *candidates*, *node_a*, *node_b* : see ``find_chains()``
+
+    Returns:
+        | *allowed* (ndarray): indices into *candidates*
+
+    """
+    num_nodes = graph.number_of_nodes()
+    edge_count = np.bincount(chains)
+    single = edge_count[chains] == 1
+    existing = np.minimum(graph.src, graph.dst)[single] * num_nodes + \
+        np.maximum(graph.src, graph.dst)[single]
+    pairs = np.minimum(node_a, node_b) * num_nodes + \
+        np.maximum(node_a, node_b)
+    allowed = np.flatnonzero((node_a != node_b) &
+                             ~np.in1d(pairs, existing))
+    _, first = np.unique(pairs[allowed], return_index=True)
+    return allowed[np.sort(first)]
+
+
+def contract_chains(graph):
+    """
+    Replace every maximal path of degree two nodes (a chain) by a single edge
+    between its end nodes, in place.
+    Edges sharing a degree two node are grouped into chains with one
+    union-find pass over the edge arrays, the attributes of all chains are
+    aggregated with one bincount per attribute and the graph is rebuilt once.
+
+    Lengths and pixels of the chain edges are summed, widths are averaged and
+    the width variances are pooled, using the edge lengths as sample sizes.
+    Like in pairwise mode no self loops or parallel edges are created, such
+    chains are contracted as far as possible instead: a chain parallel to an
+    existing edge, or to an earlier chain between the same end nodes, keeps
+    the degree two node next to its second end node, a chain returning to
+    its start node keeps the two degree two nodes next to it. So A-B plus
+    A-x-y-B becomes A-y-B. Unlike in pairwise mode, closed cycles of degree
+    two nodes are left as they are.
+
+    Args:
+        | *graph* : CompactGraph
+
+    Returns:
+        | *removed* (int): number of removed degree two nodes
+
+    """
+    num_nodes, num_edges = graph.number_of_nodes(), graph.number_of_edges()
+    if not num_edges:
+        return 0
+    # pin the degree two nodes kept by the chains which cannot be contracted
+    # as a whole, the parts of the chains between them are contracted
+    pinned = np.zeros(num_nodes, np.bool_)
+    _, _, chains, candidates, node_a, node_b, edge_a, edge_b = \
+        find_chains(graph, pinned)
+    blocked = np.ones(len(candidates), np.bool_)
+    blocked[allowed_chains(graph, chains, candidates, node_a, node_b)] = \
+        False
+    if blocked.any():
+        # the other end of an end edge is the degree two node next to it
+        loops = blocked & (node_a == node_b)
+        pinned[graph.src[edge_b[blocked]] + graph.dst[edge_b[blocked]] -
+               node_b[blocked]] = True
+        pinned[graph.src[edge_a[loops]] + graph.dst[edge_a[loops]] -
+               node_a[loops]] = True
+    inner_nodes, inner_edges, chains, candidates, node_a, node_b, _, _ = \
+        find_chains(graph, pinned)
+    allowed = allowed_chains(graph, chains, candidates, node_a, node_b)
+    num_chains = chains.max() + 1
+    edge_count = np.bincount(chains, minlength=num_chains)
+    contracted = np.zeros(num_chains, np.bool_)
+    contracted[candidates[allowed]] = True
+
+    # aggregate the edge attributes of every chain
+    new_attrs = []
+    for name, values in graph.edge_attrs.items():
+        if name in ('length', 'pixels'):
+            merged = np.bincount(chains, values, num_chains)
+        elif name == 'width_var' and 'length' in graph.edge_attrs:
+            # pooled variance with the edge lengths as sample sizes
+            lengths = graph.edge_attrs['length']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                merged = np.bincount(chains, (lengths - 1) * values,
+                                     num_chains) / \
+                    (np.bincount(chains, lengths, num_chains) - edge_count)
+        else:
+            merged = np.bincount(chains, values, num_chains) / edge_count
+        new_values = merged[candidates[allowed]].astype(values.dtype)
+        new_attrs.append((name, np.concatenate([values, new_values])))
+
+    # rebuild the graph once: add the chain edges, drop the contracted ones
+    graph.src = np.concatenate([graph.src, node_a[allowed]])
+    graph.dst = np.concatenate([graph.dst, node_b[allowed]])
+    graph.edge_attrs.update(new_attrs)
+    graph.keep_edges(np.concatenate([~contracted[chains],
+                                     np.ones(len(allowed), np.bool_)]))
+    removed = contracted[chains[inner_edges[:, 0]]]
+    keep = np.ones(num_nodes, np.bool_)
+    keep[inner_nodes[removed]] = False
+    graph.keep_nodes(keep)
+    return int(np.count_nonzero(removed))
 
 if __name__ == '__main__':
     pass
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains Benchmark class that measures the default pipelines
+without the UI. Every pipeline in nefi2/default_pipelines runs on every image
+in sample_images and on synthetic variants of these images upscaled 2, 4 and
+8 times. Each run is executed in a fresh worker process, so that the peak
+memory of one run is not hidden by an earlier one.
+
+The report lists the profiling records of every step, see
+nefi2.model.profiling, the peak memory and graph statistics of every run and
+the total time of every algorithm. A report can be passed as baseline to a
+later benchmark, then steps and runs which got slower or larger than the
+baseline by more than the regression threshold are reported as regressions.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import OrderedDict
+
+import cv2
+
+from nefi2.model.algorithms import _utility
+from nefi2.model.ext_loader import ExtensionLoader
+from nefi2.model.pipeline import Pipeline, filter_images, read_image_file
+from nefi2.model.profiling import peak_rss
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_DIR = os.path.join(os.path.dirname(MODEL_DIR), 'default_pipelines')
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(MODEL_DIR)),
+                         'sample_images')
+SCALES = (1, 2, 4, 8)
+# relative growth of time or memory reported as regression
+DEFAULT_THRESHOLD = 0.25
+# smaller differences are measurement noise
+MIN_TIME_DELTA = 0.05
+MIN_MEMORY_DELTA = 16 * 1024 ** 2
+
+
+def upscale(img, scale):
+    """
+    Create a synthetic larger variant of an image.
+
+    Args:
+        | *img* (ndarray): image
+        | *scale* (int): upscaling factor
+
+    Returns:
+        | *img* (ndarray): the image resized by *scale* along both axes
+
+    """
+    if scale == 1:
+        return img
+    return cv2.resize(img, None, fx=scale, fy=scale,
+                      interpolation=cv2.INTER_CUBIC)
+
+
+def scaled_name(fpath, scale):
+    """
+    Return the file name of an upscaled image variant, e.g. leaf_x4.jpg.
+    """
+    name, ext = os.path.splitext(os.path.basename(fpath))
+    if scale == 1:
+        return name + ext
+    return '{0}_x{1}{2}'.format(name, scale, ext)
+
+
+def run_case(pipeline_path, image_path, scale, out_dir):
+    """
+    Run a pipeline on an upscaled image with profiling enabled. Executed in
+    a worker process, the results are not saved.
+
+    Args:
+        | *pipeline_path* (str): pipeline json file
+        | *image_path* (str): image file
+        | *scale* (int): upscaling factor
+        | *out_dir* (str): benchmark output directory
+
+    Returns:
+        | *records*, *summary*, *error* : profiling records of the steps,
+          an OrderedDict describing the run and the formatted traceback if
+          the run failed, None otherwise
+
+    """
+    pip_name = os.path.splitext(os.path.basename(pipeline_path))[0]
+    fname = scaled_name(image_path, scale)
+    summary = OrderedDict([('pipeline', pip_name), ('image', fname),
+                           ('scale', scale)])
+    try:
+        pipeline = Pipeline(ExtensionLoader().cats_container)
+        pipeline.load_pipeline_json(pipeline_path)
+        pipeline.out_dir = out_dir
+        pipeline.enable_profiling()
+        img = upscale(read_image_file(image_path, '', None), scale)
+        start = time.time()
+        _, _, data = pipeline.compute_results(
+            os.path.join(os.path.dirname(image_path), fname), img)
+        summary['shape'] = list(img.shape)
+        summary['wall_time'] = time.time() - start
+        summary['peak_rss'] = peak_rss()
+        summary.update(_utility.graph_statistics(data[1]))
+    except BaseException:
+        # errors are reported with sys.exit(), so catch SystemExit as well
+        return [], summary, traceback.format_exc()
+    records = [OrderedDict([('pipeline', pip_name), ('scale', scale)] +
+                           list(record.items()))
+               for record in pipeline.profiler.records]
+    return records, summary, None
+
+
+def step_key(record):
+    """
+    Return the key identifying a step record across benchmarks.
+    """
+    return (record['pipeline'], record['image'], record['step'],
+            record['algorithm'])
+
+
+def run_key(summary):
+    """
+    Return the key identifying a run across benchmarks.
+    """
+    return summary['pipeline'], summary['image']
+
+
+def exceeds(current, base, threshold, min_delta):
+    """
+    Return True if *current* exceeds *base* by more than the relative
+    *threshold* and by at least *min_delta*. Unknown values never exceed.
+    """
+    if current is None or base is None:
+        return False
+    return current - base >= min_delta and current > base * (1 + threshold)
+
+
+class Benchmark:
+    """
+    Run the default pipelines on the sample images and their upscaled
+    variants and compare the measurements with a baseline.
+    """
+
+    def __init__(self, out_dir, pipeline_dir=PIPELINE_DIR,
+                 image_dir=IMAGE_DIR, scales=SCALES):
+        """
+        Args:
+            | *out_dir* (str): directory for the benchmark report
+            | *pipeline_dir* (str): directory with pipeline json files
+            | *image_dir* (str): directory with the images
+            | *scales* (tuple): upscaling factors, 1 runs the original image
+
+        Public Attributes:
+            | *out_dir* (str): directory for the benchmark report
+            | *cases* (list): (pipeline path, image path, scale) tuples
+            | *steps* (list): profiling records of all steps
+            | *runs* (list): an OrderedDict per run with its shape, time,
+              peak memory and graph statistics
+            | *failed* (list): (pipeline, image) tuples of failed runs
+            | *regressions* (list): an OrderedDict per regression found by
+              ``compare()``
+
+        """
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        self.out_dir = out_dir
+        pipelines = sorted(os.path.join(pipeline_dir, f)
+                           for f in os.listdir(pipeline_dir)
+                           if f.endswith('.json'))
+        images = sorted(os.path.join(image_dir, f)
+                        for f in filter_images(os.listdir(image_dir)))
+        self.cases = [(pipeline_path, image_path, scale)
+                      for pipeline_path in pipelines
+                      for image_path in images
+                      for scale in scales]
+        self.steps = []
+        self.runs = []
+        self.failed = []
+        self.regressions = []
+
+    def run(self):
+        """
+        Run all cases, one worker process per case.
+        """
+        # a new worker for every case, so the peak memory starts low
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            for num, case in enumerate(self.cases, 1):
+                records, summary, error = pool.apply(
+                    run_case, case + (self.out_dir,))
+                if error is not None:
+                    print('ERROR in Benchmark.run()', summary['pipeline'],
+                          summary['image'], 'failed:\n' + error)
+                    self.failed.append(run_key(summary))
+                    continue
+                self.steps.extend(records)
+                self.runs.append(summary)
+                print('Benchmark {0}/{1} {2} {3} {4:.3f}s'.format(
+                    num, len(self.cases), summary['pipeline'],
+                    summary['image'], summary['wall_time']))
+
+    def algorithm_totals(self):
+        """
+        Sum the step times of every algorithm over all runs.
+
+        Returns:
+            | *totals* (OrderedDict): "category: algorithm" -> OrderedDict
+              with the number of steps and their total wall and CPU time
+
+        """
+        totals = OrderedDict()
+        for record in self.steps:
+            name = record['category'] + ': ' + record['algorithm']
+            total = totals.setdefault(name, OrderedDict(
+                [('steps', 0), ('wall_time', 0.0), ('cpu_time', 0.0)]))
+            total['steps'] += 1
+            total['wall_time'] += record['wall_time']
+            total['cpu_time'] += record['cpu_time']
+        return totals
+
+    def compare(self, baseline_path, threshold=DEFAULT_THRESHOLD):
+        """
+        Compare the step times and the peak memory of the runs with a
+        baseline report written by ``write_report()``. Steps and runs
+        missing from the baseline are not compared.
+
+        Args:
+            | *baseline_path* (str): baseline json report
+            | *threshold* (float): relative growth reported as regression
+
+        Returns:
+            | *regressions* (list): an OrderedDict per regression
+
+        """
+        try:
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)
+        except (IOError, ValueError) as ex:
+            print(ex)
+            print('ERROR in Benchmark.compare() Unable to read the baseline ' +
+                  baseline_path)
+            sys.exit(1)
+        base_steps = dict((step_key(record), record)
+                          for record in baseline['steps'])
+        base_runs = dict((run_key(summary), summary)
+                         for summary in baseline['runs'])
+        self.regressions = []
+        for record in self.steps:
+            base = base_steps.get(step_key(record))
+            if base is not None and exceeds(record['wall_time'],
+                                            base['wall_time'], threshold,
+                                            MIN_TIME_DELTA):
+                self.add_regression('wall_time', record, base['wall_time'],
+                                    record['wall_time'])
+        for summary in self.runs:
+            base = base_runs.get(run_key(summary))
+            if base is not None and exceeds(summary['peak_rss'],
+                                            base['peak_rss'], threshold,
+                                            MIN_MEMORY_DELTA):
+                self.add_regression('peak_rss', summary, base['peak_rss'],
+                                    summary['peak_rss'])
+        return self.regressions
+
+    def add_regression(self, measure, record, base, current):
+        """
+        Add and print a regression of a step or run.
+        """
+        regression = OrderedDict([
+            ('measure', measure),
+            ('pipeline', record['pipeline']),
+            ('image', record['image']),
+            ('step', record.get('step')),
+            ('algorithm', record.get('algorithm')),
+            ('baseline', base),
+            ('current', current),
+            ('ratio', current / base if base else None)])
+        self.regressions.append(regression)
+        print('Regression', ', '.join('{0}={1}'.format(*col)
+                                      for col in regression.items()))
+
+    def write_report(self):
+        """
+        Write the benchmark report to the output directory: benchmark.json
+        with everything, which can be used as baseline, and the csv tables
+        benchmark_steps.csv and benchmark_runs.csv.
+
+        Returns:
+            | *json_path* (str): path of the json report
+
+        """
+        json_path = os.path.join(self.out_dir, 'benchmark.json')
+        report = OrderedDict([('steps', self.steps),
+                              ('runs', self.runs),
+                              ('algorithms', self.algorithm_totals()),
+                              ('failed', self.failed),
+                              ('regressions', self.regressions)])
+        with open(json_path, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+        for name, rows in [('steps', self.steps), ('runs', self.runs)]:
+            csv_path = os.path.join(self.out_dir,
+                                    'benchmark_' + name + '.csv')
+            with open(csv_path, 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                if rows:
+                    writer.writerow(list(rows[0]))
+                for row in rows:
+                    writer.writerow(['x'.join(map(str, value))
+                                     if isinstance(value, list) else value
+                                     for value in row.values()])
+        print('Success! benchmark report saved in', self.out_dir)
+        return json_path
+
+
+if __name__ == '__main__':
+    pass
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import copy
-import re
 import os
-import sys
-from importlib.machinery import SourceFileLoader
+from collections import OrderedDict
+
+from nefi2.model.alg_registry import load_registry
 
 
 __authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com",
@@ -24,17 +24,17 @@ class Category:
             *name* (str): Category name
 
         Private Attributes:
-            *_alg_dir* (str): a directory path for algorithms
+            *_alg_specs* (OrderedDict): a dict of {alg name: AlgSpec}
 
         Public Attributes:
             | *name* (str): Category name
             | *icon* (str): Path to custom icon to be used for this category.
             | *available_algs* (dict): a dict of {Category: [alg, alg, ...]}
+              with the algorithms instantiated so far
             | *alg_names* (list): a list of alg names for current category
             | *active_algorithm* (Algorithm): Currently selected algorithm
 
         """
-        _alg_dir = os.path.join('nefi2', 'model', 'algorithms')
         self.name = name
         if icon is not None:
             self.icon = icon
@@ -42,57 +42,47 @@ class Category:
             self.icon = os.path.join('nefi2', 'icons', 'missing.png')
         self.active_algorithm = None
         self.available_algs, self.alg_names = \
-            self._get_available_algorithms(_alg_dir)
+            self._get_available_algorithms()
 
-    def _get_available_algorithms(self, alg_dir):
+    def _get_available_algorithms(self):
         """
-        Create a new list of algorithm files from model/algorithms dir.
-        Create a dict of {Category: [alg, alg, ...]} that will be used to
-        instantiate a specific Algorithm for the current category.
-        Create a list of algorithms available for current category.
-        Raise an error if no algorithm files were found.
-
-        Args:
-            *alg_dir* (str): a directory path for algorithms
-
-        Vars:
-            | *found_algs* (list): a filtered list of algorithm file names
-            | *ignored*: a regex object, used to filter unnecessary files
-            | *imported_algs* (list): a list of imported algorithm files
+        Look up the algorithms of the current category in the algorithm
+        registry, see nefi2.model.alg_registry. The algorithms are
+        instantiated when they are selected, see ``get_algorithm()``.
 
         Returns:
             | *category_alg_map* (dict): a dict of {Category: [alg, alg, ...]}
+              with the algorithms instantiated so far
             | *alg_names* (list): algorithm list of the current category
 
         """
-        alg_files = os.listdir(alg_dir)
-        excluded = r'.*.pyc|__init__|_alg.py|__pycache__|_utility.py|_thread'
-        ign = re.compile(excluded)
-        found_algs = list(filter(lambda x: not ign.match(x), alg_files))
-        if not found_algs:
-            raise FileNotFoundError("No algorithm files were found in "
-                                    "./model/algorithms")
-        # add abs paths
-        found_algs_paths = [os.path.join('nefi2', 'model', 'algorithms', alg)
-                            for alg in found_algs]
-        # import all available algorithm files as modules
-        imported_algs = []
-        for alg_path in found_algs_paths:
-            alg_name = os.path.basename(alg_path).split('.')[0]
-            algmod = SourceFileLoader(alg_name, alg_path).load_module()
-            try:
-                new_alg = algmod.AlgBody()
-                new_alg_copy = copy.deepcopy(new_alg)
-                imported_algs.append(new_alg_copy)  # instantiating algorithms
-            except AttributeError as ex:
-                print("AttributeError in _get_available_algorithms()", ex)
-                continue
-        # assign instantiated algorithms to corresponding categories
-        category_alg_map = {self.name: [alg for alg in imported_algs
-                                        if self.name == alg.belongs()]}
-        alg_names = [alg.get_name() for alg in imported_algs
-                     if self.name == alg.belongs()]
-        return category_alg_map, alg_names
+        self._alg_specs = OrderedDict(
+            (spec.name, spec)
+            for spec in load_registry().category_specs(self.name))
+        return {self.name: []}, list(self._alg_specs)
+
+    def get_algorithm(self, alg_name):
+        """
+        Return the algorithm of the current category with the given name,
+        instantiate it if it was not used before.
+
+        Args:
+            *alg_name* (str): algorithm name
+
+        Returns:
+            *alg* (Algorithm): the algorithm or None if there is no such
+            algorithm in the category
+
+        """
+        for alg in self.available_algs[self.name]:
+            if alg.name == alg_name:
+                return alg
+        spec = self._alg_specs.get(alg_name)
+        if spec is None:
+            return None
+        alg = spec.create()
+        self.available_algs[self.name].append(alg)
+        return alg
 
     def set_active_algorithm(self, alg_name):
         """
@@ -102,9 +92,9 @@ class Category:
             *alg_name* (str): algorithm's name that was selected in the UI
 
         """
-        for alg in self.available_algs[self.name]:
-            if alg.name == alg_name:
-                self.active_algorithm = alg
+        alg = self.get_algorithm(alg_name)
+        if alg is not None:
+            self.active_algorithm = alg
 
     def get_active_algorithm(self):
         """
@@ -124,16 +114,33 @@ class Category:
             *args* (ndarray|list): ndarray or a list of ndarray and Graph
 
         """
-        selected_alg = [alg for alg in list(self.available_algs.values())[0]
-                        if self.active_algorithm.name == alg.name][0]
-        selected_alg.process(args)
+        self.active_algorithm.process(args)
         # reset modified variable after processing
-        selected_alg.unset_modified()
+        self.active_algorithm.unset_modified()
+
+    def clone(self):
+        """
+        Create a new category of the same type for the pipeline. Unlike
+        copy.deepcopy(), which copies every instantiated algorithm, only the
+        active algorithm is cloned, see ``Algorithm.clone()``. The other
+        algorithms are instantiated when they are selected.
+
+        Returns:
+            *cat* (Category): the new category
+
+        """
+        cat = copy.copy(self)
+        cat.alg_names = list(self.alg_names)
+        cat.available_algs = {self.name: []}
+        if self.active_algorithm is not None:
+            cat.active_algorithm = self.active_algorithm.clone()
+            cat.available_algs[self.name].append(cat.active_algorithm)
+        return cat
 
     def copy_alg(self, alg_name):
-        for alg in self.available_algs[self.name]:
-            if alg.name == alg_name:
-                return copy.copy(alg)
+        alg = self.get_algorithm(alg_name)
+        if alg is not None:
+            return copy.copy(alg)
 
     def get_name(self):
         """
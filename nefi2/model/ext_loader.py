@@ -7,12 +7,14 @@ settings to initialize image processing categories accordingly.
 ExtensionLoader creates a collection of categories and algorithms ready to
 be loaded into the pipeline object.
 """
+import importlib
 import re
 import os
 import xml.etree.ElementTree as et
 import sys
 from collections import OrderedDict as od
-from importlib.machinery import SourceFileLoader
+
+from nefi2.model.alg_registry import load_registry
 
 
 __authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
@@ -20,8 +22,12 @@ __authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
 
 class ExtensionLoader:
 
-    def __init__(self):
+    def __init__(self, manifest_path=None):
         """
+        Args:
+            | *manifest_path* (str): optional manifest file of the algorithm
+              registry, see nefi2.model.alg_registry
+
         public Attributes:
             | *cats_container*: a dict with Category names and instances
 
@@ -34,6 +40,8 @@ class ExtensionLoader:
             instance of the ExtensionLoader object
 
         """
+        # find the algorithms once before the categories look them up
+        load_registry(manifest_path)
         _category_dir = os.path.join('nefi2', 'model', 'categories')
         _found_cats = self._scan_model(_category_dir)
         self.cats_container = self._instantiate_cats(_found_cats)
@@ -92,7 +100,9 @@ class ExtensionLoader:
         cats_inst = []
         for cat_path in found_cats:
             cat_name = os.path.basename(cat_path).split('.')[0]
-            cat = SourceFileLoader(cat_name, cat_path).load_module()
+            # import by package name, so that categories can be pickled
+            cat = importlib.import_module('nefi2.model.categories.' +
+                                          cat_name)
             inst = cat.CatBody()
             cats_inst.append(inst)
         # sort the cats
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module writes and reads the graphs exported by the pipeline. Besides the
+networkx multiline adjacency list there are two formats for large graphs and
+downstream analytics, both written without building the file in memory:
+
+    | *npz* : numpy archive with the node coordinate arrays *xs* and *ys*,
+      the edge end point index arrays *src* and *dst* and one array per
+      edge attribute, named *edge_<attribute>*
+    | *csv* : gzip compressed edge list with one row per edge holding the
+      coordinates of both end points and the edge attributes. Nodes without
+      edges are not part of an edge list.
+
+Both are read back by ``read_graph()`` as CompactGraph, without the networkx
+text parser.
+"""
+import gzip
+import os
+import warnings
+from collections import OrderedDict
+
+import networkx.readwrite as nx
+import numpy as np
+
+from nefi2.model.algorithms._graph import CompactGraph, EDGE_ATTRIBUTES, \
+    to_compact, to_networkx
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+# format name -> file extension
+GRAPH_FORMATS = OrderedDict([('adjlist', '.txt'),
+                             ('npz', '.npz'),
+                             ('csv', '.csv.gz')])
+# number of edges formatted at once when writing csv
+CSV_CHUNK = 65536
+
+
+def write_graph(graph, path, graph_format='adjlist'):
+    """
+    Write a graph in the given format.
+
+    Args:
+        | *graph* : networkx Graph or CompactGraph
+        | *path* (str): file path without the extension
+        | *graph_format* (str): one of ``GRAPH_FORMATS``
+
+    Returns:
+        | *fpath* (str): path of the written file
+
+    """
+    fpath = path + GRAPH_FORMATS[graph_format]
+    if graph_format == 'adjlist':
+        nx.write_multiline_adjlist(to_networkx(graph), fpath, delimiter='|')
+    elif graph_format == 'npz':
+        write_npz(to_compact(graph), fpath)
+    else:
+        write_csv(to_compact(graph), fpath)
+    return fpath
+
+
+def write_npz(graph, fpath):
+    """
+    Write a CompactGraph as numpy archive, see the module description.
+    """
+    arrays = OrderedDict([('xs', graph.xs), ('ys', graph.ys),
+                          ('src', graph.src), ('dst', graph.dst)])
+    for name, values in graph.edge_attrs.items():
+        arrays['edge_' + name] = values
+    # np.savez writes one array after another into the zip file
+    with open(fpath, 'wb') as npz_file:
+        np.savez(npz_file, **arrays)
+
+
+def write_csv(graph, fpath):
+    """
+    Write a CompactGraph as gzip compressed edge list, see the module
+    description. The rows are formatted and written in chunks.
+    """
+    names = list(graph.edge_attrs)
+    with gzip.open(fpath, 'wt', compresslevel=6, newline='') as csv_file:
+        csv_file.write(','.join(['x1', 'y1', 'x2', 'y2'] + names) + '\n')
+        for start in range(0, graph.number_of_edges(), CSV_CHUNK):
+            src = graph.src[start:start + CSV_CHUNK]
+            dst = graph.dst[start:start + CSV_CHUNK]
+            columns = [graph.xs[src], graph.ys[src],
+                       graph.xs[dst], graph.ys[dst]]
+            columns += [graph.edge_attrs[name][start:start + CSV_CHUNK]
+                        for name in names]
+            np.savetxt(csv_file, np.column_stack(columns).astype(np.float64),
+                       fmt=['%d'] * 4 + ['%.17g'] * len(names),
+                       delimiter=',')
+
+
+def filter_graphs(file_list):
+    """
+    Filter out all files which ``read_graph()`` can not read.
+    """
+    return [f for f in file_list
+            if f.endswith((GRAPH_FORMATS['npz'], GRAPH_FORMATS['csv']))]
+
+
+def strip_extension(fpath):
+    """
+    Remove the graph format extension from a file path.
+    """
+    for ext in GRAPH_FORMATS.values():
+        if fpath.endswith(ext):
+            return fpath[:-len(ext)]
+    return os.path.splitext(fpath)[0]
+
+
+def read_graph(fpath):
+    """
+    Read a graph written by ``write_graph()`` in the npz or csv format.
+
+    Args:
+        | *fpath* (str): graph file path
+
+    Raises:
+        | *ValueError* : if the file is not a npz or csv graph file
+
+    Returns:
+        | *graph* (CompactGraph): the graph
+
+    """
+    if fpath.endswith(GRAPH_FORMATS['npz']):
+        return read_npz(fpath)
+    if fpath.endswith(GRAPH_FORMATS['csv']):
+        return read_csv(fpath)
+    raise ValueError('Cannot read the graph file ' + os.path.basename(fpath) +
+                     ', only the npz and csv formats are supported')
+
+
+def read_npz(fpath):
+    """
+    Read a CompactGraph written by ``write_npz()``.
+    """
+    with np.load(fpath) as arrays:
+        names = [name for name in EDGE_ATTRIBUTES
+                 if 'edge_' + name in arrays.files]
+        return CompactGraph(arrays['xs'], arrays['ys'], arrays['src'],
+                            arrays['dst'],
+                            OrderedDict((name, arrays['edge_' + name])
+                                        for name in names))
+
+
+def read_csv(fpath):
+    """
+    Read a CompactGraph written by ``write_csv()``. The nodes are numbered in
+    the order of their coordinates.
+    """
+    with gzip.open(fpath, 'rt') as csv_file:
+        names = csv_file.readline().strip().split(',')[4:]
+        with warnings.catch_warnings():
+            # a graph without edges has no rows
+            warnings.simplefilter('ignore', UserWarning)
+            table = np.loadtxt(csv_file, np.float64, delimiter=',', ndmin=2)
+    table = table.reshape(-1, 4 + len(names))
+    ends = table[:, :4].astype(np.int64)
+    coords = np.concatenate([ends[:, 0:2], ends[:, 2:4]])
+    nodes, index = np.unique(coords, axis=0, return_inverse=True)
+    index = index.reshape(-1)
+    edge_attrs = OrderedDict((name, table[:, 4 + i])
+                             for i, name in enumerate(names))
+    if 'pixels' in edge_attrs:
+        edge_attrs['pixels'] = edge_attrs['pixels'].astype(np.int64)
+    return CompactGraph(nodes[:, 0], nodes[:, 1], index[:len(ends)],
+                        index[len(ends):], edge_attrs)
+
+
+if __name__ == '__main__':
+    pass
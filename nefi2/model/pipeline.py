@@ -8,16 +8,26 @@ as an mediator between the algorithms and UI.
 """
 from nefi2.model.categories._category import Category
 from nefi2.model.algorithms import _utility
+from nefi2.model.result_store import ResultStore
+from nefi2.model import graph_io, scratch, tiling
+from nefi2.model.plan import ExecutionPlan
+from nefi2.model.profiling import Profiler, ProfileEvent
+from nefi2.model.step_cache import StepCache, \
+    DEFAULT_MAX_BYTES as DEFAULT_CACHE_BYTES
 
 import demjson
-import networkx.readwrite as nx
+import numpy as np
 import os
 import re
 import shutil
 import sys
-import copy
+import multiprocessing
+import queue
+import threading
+import traceback
 import zope.event.classhandler
 import cv2
+from collections import OrderedDict
 
 
 __authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com",
@@ -35,6 +45,11 @@ def filter_images(file_list):
     return [f for f in file_list if os.path.splitext(f)[-1] in valid_ext]
 
 
+# --start-at choices -> Category whose output is read from the input files
+START_CATEGORIES = OrderedDict([('segmentation', 'Segmentation'),
+                                ('graph', 'Graph Detection')])
+
+
 def read_image_file(fpath, prev_cat, start_from):
     """
     Read and return an image file as a numpy ndarray.
@@ -59,6 +74,220 @@ def read_image_file(fpath, prev_cat, start_from):
     return img
 
 
+def read_input_file(fpath, start_at=None):
+    """
+    Read an input file of the pipeline: an image, or the output of the
+    category the pipeline starts after.
+
+    Args:
+        | *fpath* (str): file path
+        | *start_at* (str): None to read an image, "Segmentation" to read a
+          grayscale mask, "Graph Detection" to read a graph file written by
+          ``graph_io.write_graph()``
+
+    Returns:
+        | *data* : ndarray image or CompactGraph
+
+    """
+    if start_at != 'Graph Detection':
+        return read_image_file(fpath, start_at or '', 0 if start_at is None
+                               else 1)
+    try:
+        return graph_io.read_graph(fpath)
+    except (IOError, ValueError) as ex:
+        print(ex)
+        print('ERROR in read_input_file() ' +
+              'Cannot read the graph file, make sure it is a npz or csv ' +
+              'graph file')
+        sys.exit(1)
+
+
+def graph_canvas(graph):
+    """
+    Create an empty color image large enough to draw the graph into.
+    """
+    rows = int(graph.xs.max()) + 1 if len(graph) else 1
+    cols = int(graph.ys.max()) + 1 if len(graph) else 1
+    return np.zeros((rows, cols, 3), np.uint8)
+
+
+def prefetch_images(fpaths, depth, start_at=None):
+    """
+    Read images in a background thread and yield them in order.
+    The reader thread stays at most *depth* images ahead of the consumer.
+    Errors raised while reading are re-raised in the consuming thread.
+
+    Args:
+        | *fpaths* (list): image file paths
+        | *depth* (int): maximum number of images read ahead
+        | *start_at* (str): category the pipeline starts after, see
+          ``read_input_file()``
+
+    Returns:
+        a generator of (*fpath*, *img*) tuples
+
+    """
+    buffer = queue.Queue(depth)
+    stopped = threading.Event()
+
+    def put(item):
+        # never block once the consumer stopped, it does not empty the queue
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        for fpath in fpaths:
+            try:
+                item = (fpath, read_input_file(fpath, start_at), None)
+            except BaseException as ex:
+                # read_input_file() calls sys.exit() on errors
+                item = (fpath, None, ex)
+            if not put(item) or item[2] is not None:
+                return
+        put(None)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is None:
+                break
+            fpath, img, error = item
+            if error is not None:
+                raise error
+            yield fpath, img
+    finally:
+        stopped.set()
+        reader.join()
+
+
+class ResultWriter:
+    """
+    Save processing results in a background thread.
+    At most *depth* results wait in the queue, ``put()`` blocks otherwise.
+    """
+
+    def __init__(self, save, depth):
+        """
+        Args:
+            | *save* (function): called with the arguments given to ``put()``
+            | *depth* (int): maximum number of results waiting to be saved
+
+        """
+        self.save = save
+        self.error = None
+        self._queue = queue.Queue(depth)
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def _write(self):
+        while True:
+            args = self._queue.get()
+            if args is None:
+                return
+            # keep draining the queue after an error so put() never blocks
+            if self.error is not None:
+                continue
+            try:
+                self.save(*args)
+            except BaseException as ex:
+                # save_results() calls sys.exit() on errors
+                self.error = ex
+
+    def put(self, *args):
+        """
+        Queue results for saving, re-raise a previous saving error.
+        """
+        if self.error is not None:
+            raise self.error
+        self._queue.put(args)
+
+    def close(self):
+        """
+        Wait until all queued results are saved, re-raise a saving error.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+# state of a batch worker process, set by init_batch_worker()
+_worker_pipeline = None
+_worker_stop_event = None
+
+
+def init_batch_worker(executed_cats, pipeline_path, out_dir, step_cache,
+                      tile_size, scratch_setting, graph_format, start_at,
+                      profile, stop_event):
+    """
+    Initialize a batch worker process with its own Pipeline holding a deep
+    copy of the executed categories.
+
+    Args:
+        | *executed_cats* (list): a list of Categories in the pipeline
+        | *pipeline_path* (str): a path to the loaded pipeline
+        | *out_dir* (str): a path where processing results are saved
+        | *step_cache* (StepCache): step cache shared by the workers or None
+        | *tile_size* (int): tile size for tiled processing or None
+        | *scratch_setting* (tuple): scratch directory and size threshold
+          for memory-mapped arrays, see ``Pipeline.set_scratch_dir()``
+        | *graph_format* (str): graph export format
+        | *start_at* (str): category the pipeline starts after or None
+        | *profile* (bool): measure every processed step
+        | *stop_event* (Event): set as soon as any image fails
+
+    """
+    global _worker_pipeline, _worker_stop_event
+    _worker_pipeline = Pipeline(OrderedDict())
+    _worker_pipeline.executed_cats = [cat.clone() for cat in executed_cats]
+    _worker_pipeline.pipeline_path = pipeline_path
+    _worker_pipeline.out_dir = out_dir
+    _worker_pipeline.step_cache = step_cache
+    _worker_pipeline.tile_size = tile_size
+    _worker_pipeline.graph_format = graph_format
+    _worker_pipeline.start_at = start_at
+    if profile:
+        _worker_pipeline.enable_profiling()
+    _worker_pipeline.compile()
+    scratch.set_scratch(*scratch_setting)
+    _worker_stop_event = stop_event
+
+
+def run_batch_worker(fpath):
+    """
+    Process a single image in a batch worker process.
+    Images are skipped once any worker has failed.
+
+    Args:
+        | *fpath* (str): image file path
+
+    Returns:
+        | *fpath*, *error*, *records* : image file path, the formatted
+          traceback if processing failed, None otherwise, and the profiling
+          records of the image
+
+    """
+    if _worker_stop_event.is_set():
+        return fpath, None, []
+    profiler = _worker_pipeline.profiler
+    if profiler is not None:
+        profiler.records = []
+    try:
+        _worker_pipeline.process_image(fpath)
+    except BaseException:
+        # errors are reported with sys.exit(), so catch SystemExit as well
+        _worker_stop_event.set()
+        return fpath, traceback.format_exc(), []
+    return fpath, None, profiler.records if profiler is not None else []
+
+
 class Pipeline:
     def __init__(self, categories):
         """
@@ -73,6 +302,26 @@ class Pipeline:
             | *out_dir* (str): a path where processing results are saved
             | *input_files* (list): a list of image files in the input dir
             | *cache* (list): a list of tuples where (Category name, img url)
+            | *queue_depth* (int): number of images read ahead and results
+              waiting to be written in batch mode
+            | *result_store* (ResultStore): in-memory results of the
+              categories processed in UI mode
+            | *tile_size* (int): if set, the leading Preprocessing and
+              Segmentation steps run tile by tile in batch mode, the
+              following steps use ``Algorithm.process_tiled()``
+            | *tile_jobs* (int): number of worker processes used by
+              ``Algorithm.process_tiled()``
+            | *step_cache* (StepCache): optional on-disk cache of step
+              results shared between runs, see ``set_step_cache()``
+            | *graph_format* (str): format of the exported graphs, one of
+              ``graph_io.GRAPH_FORMATS``
+            | *start_at* (str): if set, batch mode reads the output of this
+              category from the input files and starts after it, see
+              ``set_start_at()``
+            | *profiler* (Profiler): measures every processed step if set,
+              see ``enable_profiling()``
+            | *plan* (ExecutionPlan): the pipeline compiled for batch mode,
+              see ``compile()``
 
         """
         self.cache = []
@@ -80,12 +329,20 @@ class Pipeline:
         self.executed_cats = []
         self.pipeline_path = os.path.join('assets', 'json')  # default dir
         self.out_dir = os.path.join(os.getcwd(), 'output')  # default out dir
-        if not os.path.exists(self.out_dir):
-            os.mkdir(self.out_dir)
+        # parallel batch workers create their pipelines at the same time
+        os.makedirs(self.out_dir, exist_ok=True)
         self.input_files = None
+        self.queue_depth = 2
+        self.step_cache = None
+        self.tile_size = None
+        self.tile_jobs = 1
+        self.graph_format = 'adjlist'
+        self.start_at = None
+        self.profiler = None
+        self.plan = None
         self.original_img = None  # original image file as read first time
         # remember the results of each algorithm in the pipeline
-        self.pipeline_memory = {}
+        self.result_store = ResultStore()
 
     def subscribe_cache_event(self, function):
         """
@@ -120,23 +377,19 @@ class Pipeline:
         """
         # creating new blank Category
         if cat_name is None:
-            blank_cat = Category("blank")
-            blank_cat_copy = copy.deepcopy(blank_cat)
-            self.executed_cats.insert(position, blank_cat_copy)
+            self.executed_cats.insert(position, Category("blank"))
             return self.executed_cats[position]
 
         # inserting named Category
         for v in list(self.available_cats.values()):
             if v.name == cat_name:
-                cat_copy = copy.deepcopy(v)
-                self.executed_cats.insert(position, cat_copy)
+                self.executed_cats.insert(position, v.clone())
 
         # setting active Algorithm
-        for v in list(self.executed_cats[position].available_algs.values())[0]:
-            if alg_name == v.name:
-                v.set_modified()
-                self.executed_cats[position].set_active_algorithm(alg_name)
-                break
+        alg = self.executed_cats[position].get_algorithm(alg_name)
+        if alg is not None:
+            alg.set_modified()
+            self.executed_cats[position].set_active_algorithm(alg_name)
 
     def move_category(self, origin_pos, destination_pos):
         """
@@ -181,12 +434,11 @@ class Pipeline:
 
     def process(self):
         """
-        Process input image selected in UI, save intermediate results in
-        _cache_ and enable pipeline recalculation from the category that was
-        first changed.
-        Keep all intermediate results.
-        <This function will be obviously slower than the console variant due
-        to IO operations on the _cache_ directory.>
+        Process input image selected in UI, keep intermediate results in the
+        in-memory ``result_store`` and enable pipeline recalculation from the
+        first category whose result is not stored.
+        Only the results of categories with ``store_image`` set and the final
+        result are written to the output directory.
         """
         # reset cache list
         self.cache = []
@@ -197,94 +449,259 @@ class Pipeline:
         pip_name = os.path.splitext(os.path.basename(self.pipeline_path))[0]
         out_path = os.path.join(self.out_dir,
                                 '_'.join([pip_name, orig_fname]))
-        # check if any algorithm has changed
-        for idx, cat in enumerate(self.executed_cats):
-            if cat.active_algorithm.modified:
-                prev_cat_idx = 0 if idx - 1 < 0 else idx - 1
-                if idx - 1 < 0:
-                    start_idx = 0
-                    prev_cat_name = self.executed_cats[0].name
-                else:
-                    start_idx = idx
-                    prev_cat_name = self.executed_cats[prev_cat_idx].name
-                break
-            prev_cat_idx = 0
-            start_idx = 0
-            prev_cat_name = self.executed_cats[prev_cat_idx].name
-
-        # decide which category to continue from if any, act accordingly
-        if prev_cat_idx == 0 and start_idx == 0:
-            # new pipeline, read original img
-            orig_arr = read_image_file(img_fpath, '', start_idx)
-            self.pipeline_memory[prev_cat_idx] = orig_arr
-            data = [self.pipeline_memory[prev_cat_idx], None]
-            self.original_img = data[0]
+        input_key, step_keys = self.get_result_keys(img_fpath)
+        # continue from the first category without a stored result,
+        # the last category is always processed
+        start_idx = 0
+        while start_idx < len(step_keys) - 1 and \
+                step_keys[start_idx] in self.result_store:
+            start_idx += 1
+
+        # get the results of the previous (unmodified) algorithm before
+        # storing the original image can evict them
+        data = None
+        if start_idx > 0:
+            data = self.result_store.get(step_keys[start_idx - 1])
+            if data is None:
+                start_idx = 0
+
+        # read the original image only if it is not stored
+        stored_input = self.result_store.get(input_key)
+        if stored_input is None:
+            self.original_img = read_image_file(img_fpath, '', 0)
+            self.result_store.put(input_key, [self.original_img, None])
         else:
-            # get the results of the previous (unmodified) algorithm
-            data = self.pipeline_memory.get(prev_cat_idx)
-            # remember the prev path
-            prev_path = self.pipeline_memory[prev_cat_idx][0]
-            # we need to read grayscale if previous category was Segmentation
-            data[0] = read_image_file(prev_path, prev_cat_name, start_idx)
-
-        # release memory
-        if start_idx != 0:
-            released = [prev_path, data[1] or None, prev_cat_name]
-            self.pipeline_memory[prev_cat_idx] = released
+            self.original_img = stored_input[0]
+        if start_idx == 0:
+            data = [self.original_img.copy(), None]
+        last_idx = len(self.executed_cats) - 1
+        cache_keys = None
+        if self.step_cache is not None:
+            # a later step result may be cached on disk by an earlier run
+            cache_keys = self.step_cache.get_keys(self.original_img,
+                                                  self.executed_cats)
+            cached_idx, cached = self.step_cache.find_last(
+                cache_keys[start_idx:last_idx])
+            if cached is not None:
+                data, start_idx = cached, start_idx + cached_idx + 1
+                if data[1]:
+                    data[0] = _utility.draw_graph(self.original_img, data[1])
+
         # main pipeline loop, execute the pipeline from the modified category
         for num, cat in enumerate(self.executed_cats[start_idx:], start_idx):
             progress = (num / len(self.executed_cats)) * 100
             report = cat.name + " - " + cat.active_algorithm.name
             zope.event.notify(ProgressEvent(progress, report))
+            snapshot = self.profiler.start(data) if self.profiler else None
             cat.process(data)
             # reassign results of the prev alg for the next one
             data = list(cat.active_algorithm.result.items())
             data.sort(key=lambda x: ['img', 'graph'].index(x[0]))
             data = [i[1] for i in data]
+            if self.profiler is not None:
+                self.profile_step(snapshot, img_fpath, num, cat.get_name(),
+                                  cat.active_algorithm.name, data)
+            if cache_keys is not None:
+                self.step_cache.put(cache_keys[num], data)
             # check if we have graph
             if data[1]:
                 # draw the graph into the original image
                 data[0] = _utility.draw_graph(self.original_img, data[1])
+            self.result_store.put(step_keys[num], data)
             # save the results
-            save_fname = self.get_results_fname(img_fpath, cat)
-            save_path = os.path.join(out_path, save_fname)
-            self.save_results(save_path, save_fname, data)
+            save_path = None
+            if cat.active_algorithm.store_image or num == last_idx:
+                save_fname = self.get_results_fname(img_fpath, cat)
+                save_path = os.path.join(out_path, save_fname)
+                self.save_results(save_path, save_fname, data)
             # update the cache
-            self.update_cache(cat, save_path)
-            cache_path = os.path.join(os.getcwd(), '_cache_', save_fname)
-            self.pipeline_memory[num] = [cache_path, data[1], cat.name]
+            self.update_cache(cat, save_path, data[0])
             # release memory
             cat.active_algorithm.result['img'] = ''
 
-    def process_batch(self):
+    def get_result_keys(self, img_fpath):
+        """
+        Create the ``result_store`` keys of the input image and of the
+        results of every category in the pipeline.
+        The key of a category result depends on the input image and on the
+        settings of this and all previous algorithms.
+
+        Args:
+            | *img_fpath* (str): input image file path
+
+        Returns:
+            | *input_key*, *step_keys* : key of the input image and a list of
+              keys for the results of the categories in ``executed_cats``
+
+        """
+        try:
+            input_id = (img_fpath, os.path.getmtime(img_fpath))
+        except OSError:
+            input_id = (img_fpath, None)
+        reports = []
+        step_keys = []
+        for num, cat in enumerate(self.executed_cats):
+            alg_name, alg_dic = cat.active_algorithm.report_pip()
+            reports.append((alg_name, tuple(alg_dic.items())))
+            step_keys.append((input_id, num, tuple(reports)))
+        return (input_id, -1, ()), step_keys
+
+    def process_batch(self, jobs=1):
         """
         Process a given image or a directory of images using predefined
         pipeline.
+        Reading and writing images runs in background threads, which keep
+        at most ``queue_depth`` images ahead of and behind the processing.
+
+        Args:
+            | *jobs* (int): number of worker processes, each worker processes
+              its share of the input images with its own copy of the pipeline.
+              If ``tile_size`` is set, the images are processed one after the
+              other and the workers share the tiles of an image instead
+
         """
-        for fpath in self.input_files:
-            # create and set output dir name
-            orig_fname = os.path.splitext(os.path.basename(fpath))[0]
-            pip_name = os.path.splitext(os.path.basename(self.pipeline_path))[0]
-            dir_name = os.path.join(self.out_dir, '_'.join([pip_name,
-                                                            orig_fname]))
-            data = [read_image_file(fpath, '', None), None]
-            self.original_img = data[0]
-            # process given image with the pipeline
-            last_cat = None
-            for cat in self.executed_cats:
-                cat.process(data)
-                # reassign results of the prev alg for the next one
-                data = list(cat.active_algorithm.result.items())
-                data.sort(key=lambda x: ['img', 'graph'].index(x[0]))
-                data = [i[1] for i in data]
-                last_cat = cat
-            if data[1]:
-                # draw the graph into the original image
-                data[0] = _utility.draw_graph(self.original_img, data[1])
-            # save the results and update the cache if store_image is True
-            save_fname = self.get_results_fname(fpath, last_cat)
-            save_path = os.path.join(dir_name, save_fname)
-            self.save_results(save_path, save_fname, data)
+        self.compile()
+        if self.tile_size:
+            self.tile_jobs = jobs
+        elif jobs > 1 and len(self.input_files) > 1:
+            self.process_batch_parallel(jobs)
+            return
+        # read the next and write the previous images while processing
+        writer = ResultWriter(self.save_results, self.queue_depth)
+        try:
+            for fpath, img in prefetch_images(self.input_files,
+                                              self.queue_depth,
+                                              self.start_at):
+                writer.put(*self.compute_results(fpath, img))
+        finally:
+            writer.close()
+        if self.profiler is not None:
+            self.write_profile()
+
+    def process_batch_parallel(self, jobs):
+        """
+        Process the input images with a pool of worker processes.
+        Every worker gets its own clone of ``executed_cats``, see
+        ``init_batch_worker()``. If an image fails, the workers finish the
+        images they are working on, skip all remaining images and the batch
+        run exits with an error.
+
+        Args:
+            | *jobs* (int): number of worker processes
+
+        """
+        stop_event = multiprocessing.Event()
+        init_args = (self.executed_cats, self.pipeline_path, self.out_dir,
+                     self.step_cache, self.tile_size, scratch.get_scratch(),
+                     self.graph_format, self.start_at,
+                     self.profiler is not None, stop_event)
+        failed = []
+        with multiprocessing.Pool(jobs, init_batch_worker, init_args) as pool:
+            for fpath, error, records in pool.imap_unordered(
+                    run_batch_worker, self.input_files):
+                for record in records:
+                    self.profiler.records.append(record)
+                    zope.event.notify(ProfileEvent(record))
+                if error:
+                    print(error)
+                    print('ERROR in process_batch_parallel() ' +
+                          'Processing ' + fpath + ' failed, ' +
+                          'skipping the remaining images')
+                    failed.append(fpath)
+        if self.profiler is not None:
+            self.write_profile()
+        if failed:
+            sys.exit(1)
+
+    def process_image(self, fpath):
+        """
+        Process a single image using predefined pipeline and save the
+        results in the output directory.
+
+        Args:
+            | *fpath* (str): image file path
+
+        """
+        img = read_input_file(fpath, self.start_at)
+        self.save_results(*self.compute_results(fpath, img))
+
+    def compute_results(self, fpath, img):
+        """
+        Run the predefined pipeline on an image.
+
+        Args:
+            | *fpath* (str): image file path
+            | *img* (ndarray): the image read from *fpath*, or the mask or
+              graph if the pipeline starts after Segmentation or Graph
+              Detection
+
+        Returns:
+            | *save_path*, *save_fname*, *data* : arguments for
+              ``save_results()``
+
+        """
+        plan = self.plan
+        if plan is None or not plan.is_current(self.executed_cats):
+            plan = self.compile()
+        data = [img, None]
+        start_idx = 0
+        if self.start_at is not None:
+            start_idx = self.get_start_index()
+            if self.start_at == 'Graph Detection':
+                # the graph is drawn into an empty png image named after it
+                fpath = graph_io.strip_extension(fpath) + '.png'
+                data = [graph_canvas(img), img]
+        self.original_img = data[0]
+        if self.original_img.ndim == 2:
+            # the graph is drawn in color into a segmentation mask
+            self.original_img = cv2.cvtColor(self.original_img,
+                                             cv2.COLOR_GRAY2BGR)
+        # create and set output dir name
+        orig_fname = os.path.splitext(os.path.basename(fpath))[0]
+        pip_name = os.path.splitext(os.path.basename(self.pipeline_path))[0]
+        dir_name = os.path.join(self.out_dir, '_'.join([pip_name,
+                                                        orig_fname]))
+        # skip the steps with cached results
+        keys = None
+        if self.step_cache is not None and start_idx == 0:
+            keys = self.step_cache.get_keys(img, self.executed_cats)
+            cached_idx, cached = self.step_cache.find_last(keys)
+            if cached is not None:
+                data, start_idx = cached, cached_idx + 1
+        # run the leading preprocessing and segmentation steps in tiles
+        if self.tile_size and start_idx == 0:
+            start_idx = plan.tileable
+            if start_idx:
+                tiled = self.executed_cats[:start_idx]
+                snapshot = self.profiler.start(data) if self.profiler else None
+                data = [tiling.process_tiled(tiled, img, self.tile_size), None]
+                if self.profiler is not None:
+                    self.profile_step(
+                        snapshot, fpath, start_idx - 1,
+                        ' + '.join(cat.get_name() for cat in tiled),
+                        ' + '.join(cat.active_algorithm.name for cat in tiled),
+                        data)
+                if keys is not None:
+                    self.step_cache.put(keys[start_idx - 1], data)
+        # process given image with the pipeline
+        for step in plan.steps[start_idx:]:
+            snapshot = self.profiler.start(data) if self.profiler else None
+            data = step.run(data, self.tile_size, self.tile_jobs)
+            # large images, e.g. the segmentation mask, may be spilled
+            data = [scratch.spill(i) for i in data]
+            if self.profiler is not None:
+                self.profile_step(snapshot, fpath, step.num, step.cat_name,
+                                  step.alg_name, data)
+            if keys is not None:
+                self.step_cache.put(keys[step.num], data)
+        last_cat = plan.steps[-1].cat
+        if data[1]:
+            # draw the graph into the original image
+            data[0] = _utility.draw_graph(self.original_img, data[1])
+        # save the results and update the cache if store_image is True
+        save_fname = self.get_results_fname(fpath, last_cat)
+        save_path = os.path.join(dir_name, save_fname)
+        return save_path, save_fname, data
 
     def save_results(self, save_path, image_name, results):
         """
@@ -297,10 +714,10 @@ class Pipeline:
             | *results* (list): a list of arguments to save
 
         """
-        # check if the save directory exists
+        # create the save directory, parallel workers may save images with
+        # the same name, e.g. a.png and a.jpg, into it at the same time
         dir_to_save = os.path.dirname(save_path)
-        if not os.path.exists(dir_to_save):
-            os.mkdir(dir_to_save)
+        os.makedirs(dir_to_save, exist_ok=True)
         # saving the processed image
         try:
             saved = cv2.imwrite(save_path, results[0])
@@ -316,11 +733,35 @@ class Pipeline:
             sys.exit(1)
         # exporting graph object
         if results[1]:
-            image_name = os.path.splitext(image_name)[0] + '.txt'
-            nx.write_multiline_adjlist(results[1], os.path.join(dir_to_save,
-                                                                image_name),
-                                       delimiter='|')
-            print('Success!', image_name, 'saved in', dir_to_save)
+            graph_path = graph_io.write_graph(
+                results[1],
+                os.path.join(dir_to_save, os.path.splitext(image_name)[0]),
+                self.graph_format)
+            print('Success!', os.path.basename(graph_path), 'saved in',
+                  dir_to_save)
+
+    def compile(self):
+        """
+        Check the pipeline with ``sanity_check()`` and compile it into the
+        execution plan used by batch mode, see nefi2.model.plan.
+        The plan is compiled again whenever the categories or their active
+        algorithms change.
+
+        Returns:
+            | *plan* (ExecutionPlan): the compiled pipeline
+
+        """
+        message, _ = self.sanity_check()
+        if message:
+            print('ERROR in compile() ' + message)
+            sys.exit(1)
+        try:
+            self.plan = ExecutionPlan(self.executed_cats)
+        except ValueError as ex:
+            print(ex)
+            print('ERROR in compile() Cannot compile the pipeline')
+            sys.exit(1)
+        return self.plan
 
     def sanity_check(self):
         """
@@ -413,7 +854,7 @@ class Pipeline:
         """
         for v in list(self.available_cats.values()):
             if v.name == cat_name:
-                self.executed_cats[position] = copy.deepcopy(v)
+                self.executed_cats[position] = v.clone()
 
     def change_algorithm(self, alg_name, position):
         """
@@ -425,10 +866,10 @@ class Pipeline:
             | *alg_name*: algorithm name
 
         """
-        for v in list(self.executed_cats[position].available_algs.values())[0]:
-            if alg_name == v.name:
-                v.set_modified()
-                self.executed_cats[position].set_active_algorithm(alg_name)
+        alg = self.executed_cats[position].get_algorithm(alg_name)
+        if alg is not None:
+            alg.set_modified()
+            self.executed_cats[position].set_active_algorithm(alg_name)
 
     def get_executed_cats(self):
         """
@@ -539,7 +980,10 @@ class Pipeline:
 
         """
         if os.path.isdir(input_source):
-            files = filter_images(os.listdir(input_source))
+            if self.start_at == 'Graph Detection':
+                files = graph_io.filter_graphs(os.listdir(input_source))
+            else:
+                files = filter_images(os.listdir(input_source))
             self.input_files = [os.path.join(input_source, f) for f in files]
         elif os.path.isfile(input_source):
             self.input_files = [input_source]
@@ -548,6 +992,85 @@ class Pipeline:
         zope.event.notify(CacheInputEvent(os.path.basename(input_source), input_source))
         shutil.copy(self.input_files[0], '_cache_')
 
+    def set_step_cache(self, cache_dir, max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Enable the on-disk step cache, so that runs on the same image which
+        share a prefix of the pipeline continue from the first differing
+        category.
+
+        Args:
+            | *cache_dir* (str): directory for the cached step results
+            | *max_bytes* (int): size limit of the cache in bytes
+
+        """
+        self.step_cache = StepCache(cache_dir, max_bytes)
+
+    def set_start_at(self, cat_name):
+        """
+        Start batch processing after a category, reading its output from
+        the input files instead of processing images. This reruns e.g. only
+        the graph filtering on already extracted graphs.
+
+        Args:
+            | *cat_name* (str): "Segmentation" to read segmentation masks,
+              "Graph Detection" to read npz or csv graph files, None to
+              process images
+
+        """
+        self.start_at = cat_name
+        if cat_name is not None:
+            self.get_start_index()
+
+    def get_start_index(self):
+        """
+        Return the position of the first category processed after
+        ``start_at``, i.e. the position after the last category named
+        ``start_at``.
+        """
+        names = [cat.get_name() for cat in self.executed_cats]
+        if self.start_at not in names:
+            print('ERROR in get_start_index() The pipeline has no ' +
+                  self.start_at + ' category to start after')
+            sys.exit(1)
+        return len(names) - names[::-1].index(self.start_at)
+
+    def enable_profiling(self):
+        """
+        Measure every processed step, see nefi2.model.profiling. Batch mode
+        writes a json and a csv report to the output directory.
+        """
+        self.profiler = Profiler()
+
+    def profile_step(self, snapshot, fpath, num, cat_name, alg_name, data):
+        """
+        Record the measurements of a processed step and report them as
+        ProfileEvent, see ``Profiler.stop()``.
+        """
+        record = self.profiler.stop(snapshot, fpath, num, cat_name, alg_name,
+                                    data)
+        zope.event.notify(ProfileEvent(record))
+
+    def write_profile(self):
+        """
+        Write the profiling report of a batch run to the output directory.
+        """
+        pip_name = os.path.splitext(os.path.basename(self.pipeline_path))[0]
+        self.profiler.write_report(self.out_dir, pip_name)
+
+    def set_scratch_dir(self, scratch_dir, threshold):
+        """
+        Spill intermediate arrays of at least *threshold* bytes, e.g. the
+        segmentation mask, the skeleton and the edge labels, to
+        memory-mapped files in *scratch_dir*, see nefi2.model.scratch.
+
+        Args:
+            | *scratch_dir* (str): directory for the scratch files, None
+              keeps all arrays in memory
+            | *threshold* (int): size threshold in bytes
+
+        """
+        scratch.set_scratch(scratch_dir, threshold)
+
     def set_output_dir(self, dir_path):
         """
         Create and set the directory where to save the results of processing.
@@ -632,29 +1155,19 @@ class Pipeline:
         os.mkdir('_cache_')
         self.cache = []
 
-    def update_cache(self, cat, img_path):
+    def update_cache(self, cat, img_path, img=None):
         """
-        Copy an img to cache dir and update the cache list.
+        Notify the UI about a new intermediate result and update the cache
+        list.
 
         Args:
             | *category*: Category
-            | *img_path* (str): image path
+            | *img_path* (str): saved image path or None if not saved
+            | *img* (ndarray): the resulting image
 
         """
-        try:
-            shutil.copy(img_path, '_cache_')
-        except (IOError, OSError) as ex:
-            print(ex)
-            print('ERROR in update_cache() ' +
-                  'Cannot copy to _cache_ directory, make sure there ' +
-                  'is enough space on disk')
-            sys.exit(1)
-
-        cache_img_path = os.path.join(os.getcwd(), '_cache_',
-                                      os.path.basename(img_path))
-
-        zope.event.notify(CacheAddEvent(cat, cache_img_path))
-        self.cache.append((cat, cache_img_path))
+        zope.event.notify(CacheAddEvent(cat, img_path, img))
+        self.cache.append((cat, img_path))
 
 
 class ProgressEvent(object):
@@ -669,12 +1182,14 @@ class ProgressEvent(object):
 
 class CacheAddEvent(object):
     """
-    This event is used to report the maincontroller the new cached image
+    This event is used to report the maincontroller the new cached image.
+    *img* holds the image itself, *path* is None if it was not saved.
     """
 
-    def __init__(self, cat, path):
+    def __init__(self, cat, path, img=None):
         self.cat = cat
         self.path = path
+        self.img = img
 
 
 class CacheRemoveEvent(object):
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains ExecutionPlan class, the compiled form of the categories
+of a pipeline used by batch mode, see ``Pipeline.compile()``. The plan is a
+flat list of steps holding the bound processing methods of the active
+algorithms and the [img, graph] slots every step reads and writes, so that
+processing an image needs no algorithm lookups. It is validated once when it
+is compiled and is the place for decisions about how the steps are executed.
+"""
+from nefi2.model import tiling
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+# category name -> ([img, graph] slots read, slots written)
+STEP_SLOTS = {'Preprocessing': (('img',), ('img',)),
+              'Segmentation': (('img',), ('img',)),
+              'Graph Detection': (('img',), ('img', 'graph')),
+              'Graph Filtering': (('img', 'graph'), ('img', 'graph'))}
+# slots of custom categories
+DEFAULT_SLOTS = (('img',), ('img', 'graph'))
+
+
+class PlanStep:
+    """
+    A pipeline step bound to the active algorithm of its category.
+    """
+
+    def __init__(self, num, cat):
+        """
+        Args:
+            | *num* (int): step position in the pipeline
+            | *cat* (Category): the category of the step
+
+        Public Attributes:
+            | *num* (int): step position in the pipeline
+            | *cat* (Category): the category of the step
+            | *alg* (Algorithm): the active algorithm of *cat*
+            | *cat_name*, *alg_name* (str): category and algorithm names
+            | *inputs*, *outputs* (tuple): [img, graph] slots the step reads
+              and writes
+
+        """
+        self.num = num
+        self.cat = cat
+        self.alg = cat.active_algorithm
+        self.cat_name = cat.get_name()
+        self.alg_name = self.alg.name
+        self.inputs, self.outputs = STEP_SLOTS.get(self.cat_name,
+                                                   DEFAULT_SLOTS)
+        self._process = self.alg.process
+        self._process_tiled = self.alg.process_tiled
+
+    def run(self, data, tile_size=None, jobs=1):
+        """
+        Process the step.
+
+        Args:
+            | *data* (list): [img, graph] input of the step
+            | *tile_size* (int): if set, the algorithm processes the image
+              tile by tile, see ``Algorithm.process_tiled()``
+            | *jobs* (int): number of worker processes for the tiles
+
+        Returns:
+            | *data* (list): [img, graph] result of the step
+
+        """
+        if tile_size:
+            self._process_tiled(data, tile_size, jobs)
+        else:
+            self._process(data)
+        self.alg.unset_modified()
+        result = self.alg.result
+        return [result['img'], result['graph']]
+
+
+class ExecutionPlan:
+    """
+    The compiled steps of a pipeline.
+    """
+
+    def __init__(self, executed_cats):
+        """
+        Args:
+            | *executed_cats* (list): a list of Categories in the pipeline
+
+        Public Attributes:
+            | *steps* (list): a PlanStep per category
+            | *tileable* (int): number of leading steps that can be processed
+              in tiles, see ``tiling.count_tileable()``
+
+        Raises:
+            | *ValueError* : if a step reads a slot no previous step wrote
+
+        """
+        self.steps = [PlanStep(num, cat)
+                      for num, cat in enumerate(executed_cats)]
+        self.tileable = tiling.count_tileable(executed_cats)
+        written = {'img'}
+        for step in self.steps:
+            missing = [slot for slot in step.inputs if slot not in written]
+            if missing:
+                raise ValueError("Step {0} '{1}' needs a {2} input".format(
+                    step.num, step.cat_name, ' and '.join(missing)))
+            written.update(step.outputs)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def is_current(self, executed_cats):
+        """
+        Return True if the plan still matches the categories and their
+        active algorithms.
+        """
+        return len(self.steps) == len(executed_cats) and \
+            all(step.cat is cat and step.alg is cat.active_algorithm
+                for step, cat in zip(self.steps, executed_cats))
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains Profiler class that measures every pipeline step: wall
+time, CPU time, growth of the peak resident memory, the shapes of the input
+and output images and the size of the output graph. Every measured step is
+reported as ProfileEvent and all measurements of a batch run are written to a
+json and a csv report next to the batch output.
+"""
+import csv
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, the memory columns stay empty there
+    resource = None
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+REPORT_COLUMNS = ('image', 'step', 'category', 'algorithm', 'wall_time',
+                  'cpu_time', 'peak_rss_delta', 'input_shape',
+                  'output_shape', 'nodes', 'edges')
+
+
+def peak_rss():
+    """
+    Return the peak resident memory of the process in bytes, None if it is
+    unknown.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on OS X
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def image_shape(img):
+    """
+    Return the shape of an image as list, None if there is no image.
+    """
+    if isinstance(img, np.ndarray):
+        return list(img.shape)
+    return None
+
+
+class ProfileEvent(object):
+    """
+    This event reports the measurements of a processed pipeline step,
+    *record* is an OrderedDict with the ``REPORT_COLUMNS`` keys.
+    """
+
+    def __init__(self, record):
+        self.record = record
+
+
+class Profiler:
+    """
+    Collect the measurements of pipeline steps.
+    """
+
+    def __init__(self):
+        """
+        Public Attributes:
+            | *records* (list): an OrderedDict per measured step
+
+        """
+        self.records = []
+
+    def start(self, data):
+        """
+        Start measuring a step.
+
+        Args:
+            | *data* (list): [img, graph] input of the step
+
+        Returns:
+            | *snapshot* (tuple): pass it to ``stop()``
+
+        """
+        return (time.time(), time.process_time(), peak_rss(),
+                image_shape(data[0]))
+
+    def stop(self, snapshot, fpath, num, cat_name, alg_name, data):
+        """
+        Finish measuring a step and add its record.
+        The CPU time does not include worker processes of the step.
+
+        Args:
+            | *snapshot* (tuple): returned by ``start()``
+            | *fpath* (str): processed input file
+            | *num* (int): step position in the pipeline
+            | *cat_name* (str): category name
+            | *alg_name* (str): algorithm name
+            | *data* (list): [img, graph] output of the step
+
+        Returns:
+            | *record* (OrderedDict): the measurements of the step
+
+        """
+        wall, cpu, rss, input_shape = snapshot
+        peak = peak_rss()
+        graph = data[1]
+        record = OrderedDict([
+            ('image', os.path.basename(fpath)),
+            ('step', num),
+            ('category', cat_name),
+            ('algorithm', alg_name),
+            ('wall_time', time.time() - wall),
+            ('cpu_time', time.process_time() - cpu),
+            ('peak_rss_delta', None if peak is None else peak - rss),
+            ('input_shape', input_shape),
+            ('output_shape', image_shape(data[0])),
+            ('nodes', None if graph is None else graph.number_of_nodes()),
+            ('edges', None if graph is None else graph.number_of_edges())])
+        self.records.append(record)
+        return record
+
+    def write_report(self, out_dir, name):
+        """
+        Write all records as json and csv report.
+
+        Args:
+            | *out_dir* (str): output directory
+            | *name* (str): report name, e.g. the pipeline name
+
+        Returns:
+            | *json_path*, *csv_path* (str): paths of the written reports
+
+        """
+        json_path = os.path.join(out_dir, 'profile_' + name + '.json')
+        csv_path = os.path.join(out_dir, 'profile_' + name + '.csv')
+        with open(json_path, 'w') as json_file:
+            json.dump(self.records, json_file, indent=2)
+        with open(csv_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(REPORT_COLUMNS)
+            for record in self.records:
+                writer.writerow(['x'.join(map(str, value))
+                                 if isinstance(value, list) else value
+                                 for value in record.values()])
+        print('Success!', os.path.basename(json_path), 'and',
+              os.path.basename(csv_path), 'saved in', out_dir)
+        return json_path, csv_path
+
+
+if __name__ == '__main__':
+    pass
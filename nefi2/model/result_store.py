@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains ResultStore class that keeps the intermediate results of
+the pipeline categories in memory. It is used by the Pipeline to recalculate
+a pipeline in the UI from the first changed category without reading the
+previous results back from the disk.
+"""
+from collections import OrderedDict
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+# default size limit of the stored results in bytes
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+# rough memory footprint of a networkx node or edge with its attributes
+GRAPH_ELEMENT_BYTES = 500
+
+
+def estimate_nbytes(obj):
+    """
+    Estimate the memory used by an image array or a graph object.
+
+    Args:
+        | *obj* : ndarray, graph object or None
+
+    Returns:
+        *nbytes* (int): estimated size in bytes
+
+    """
+    if obj is None:
+        return 0
+    # ndarray and CompactGraph
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    if hasattr(obj, 'number_of_edges'):
+        return GRAPH_ELEMENT_BYTES * (obj.number_of_nodes() +
+                                      obj.number_of_edges())
+    return 0
+
+
+def copy_result(obj):
+    """
+    Copy an image array or a graph, so that algorithms modifying their input
+    in place do not change a stored result.
+    """
+    if obj is None or not hasattr(obj, 'copy'):
+        return obj
+    return obj.copy()
+
+
+class ResultStore:
+    """
+    A size limited in-memory store of [img, graph] results.
+    The least recently used results are evicted first once the total size
+    exceeds *max_bytes*.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            | *max_bytes* (int): size limit of the stored results in bytes
+
+        Public Attributes:
+            | *max_bytes* (int): size limit of the stored results in bytes
+            | *nbytes* (int): current size of the stored results in bytes
+
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._results = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key):
+        """
+        Return a copy of a stored result and mark it as recently used.
+
+        Args:
+            | *key* : hashable key of the result
+
+        Returns:
+            | *result* (list): a copy of the stored [img, graph] or None
+
+        """
+        if key not in self._results:
+            return None
+        self._results.move_to_end(key)
+        img, graph, _ = self._results[key]
+        return [copy_result(img), copy_result(graph)]
+
+    def put(self, key, result):
+        """
+        Store a copy of a result and evict the least recently used results
+        if the size limit is exceeded.
+        Results larger than the size limit are not stored.
+
+        Args:
+            | *key* : hashable key of the result
+            | *result* (list): [img, graph]
+
+        """
+        self.discard(key)
+        img, graph = result[0:2]
+        nbytes = estimate_nbytes(img) + estimate_nbytes(graph)
+        if nbytes > self.max_bytes:
+            return
+        while self._results and self.nbytes + nbytes > self.max_bytes:
+            _, (_, _, evicted) = self._results.popitem(last=False)
+            self.nbytes -= evicted
+        self._results[key] = (copy_result(img), copy_result(graph), nbytes)
+        self.nbytes += nbytes
+
+    def discard(self, key):
+        """
+        Remove a result if it is stored.
+
+        Args:
+            | *key* : hashable key of the result
+
+        """
+        if key in self._results:
+            self.nbytes -= self._results.pop(key)[2]
+
+    def clear(self):
+        """
+        Remove all stored results.
+        """
+        self._results.clear()
+        self.nbytes = 0
+
+
+if __name__ == '__main__':
+    pass
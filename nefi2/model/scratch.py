@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module allocates the large intermediate arrays of the pipeline, e.g. the
+segmentation mask, the skeleton and the edge labels of graph detection. Arrays
+larger than a size threshold can be spilled to memory-mapped files in a scratch
+directory, so that images too big to hold several copies in memory at once
+can still be processed. The operating system then keeps only the pages in use
+in memory.
+
+Spilling is disabled by default, see ``set_scratch()``. The scratch files are
+removed as soon as they are created and disappear together with the last
+array using them.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+# scratch directory and size threshold in bytes, None disables spilling
+_scratch_dir = None
+_threshold = None
+
+
+def set_scratch(scratch_dir, threshold):
+    """
+    Enable or disable spilling arrays to memory-mapped files.
+
+    Args:
+        | *scratch_dir* (str): directory for the scratch files, None
+          disables spilling
+        | *threshold* (int): arrays of at least this many bytes are
+          memory-mapped
+
+    """
+    global _scratch_dir, _threshold
+    if scratch_dir is not None and not os.path.exists(scratch_dir):
+        os.makedirs(scratch_dir)
+    _scratch_dir, _threshold = scratch_dir, threshold
+
+
+def get_scratch():
+    """
+    Return the current (scratch_dir, threshold) setting, e.g. to pass it to
+    worker processes.
+    """
+    return _scratch_dir, _threshold
+
+
+def spills(nbytes):
+    """
+    Return True if an array of *nbytes* bytes is memory-mapped.
+    """
+    return _scratch_dir is not None and nbytes >= _threshold
+
+
+def empty(shape, dtype):
+    """
+    Allocate an uninitialized array, memory-mapped if it is large.
+
+    Args:
+        | *shape* (tuple): array shape
+        | *dtype* : array data type
+
+    Returns:
+        | *arr* (ndarray): numpy.memmap or ndarray
+
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    if not spills(nbytes) or nbytes == 0:
+        return np.empty(shape, dtype)
+    # the file is already unlinked, the mapping keeps its data alive
+    with tempfile.TemporaryFile(dir=_scratch_dir) as scratch_file:
+        return np.memmap(scratch_file, dtype, 'w+', shape=shape)
+
+
+def zeros(shape, dtype):
+    """
+    Allocate an array filled with zeros, memory-mapped if it is large.
+    """
+    arr = empty(shape, dtype)
+    if isinstance(arr, np.memmap):
+        # new scratch files read as zeros
+        return arr
+    arr.fill(0)
+    return arr
+
+
+def copy(arr):
+    """
+    Copy an array, the copy is memory-mapped if it is large.
+    """
+    result = empty(arr.shape, arr.dtype)
+    result[...] = arr
+    return result
+
+
+def spill(arr):
+    """
+    Move a large array to a memory-mapped file. Small arrays, other objects
+    and arrays which are memory-mapped already are returned unchanged.
+    """
+    if not isinstance(arr, np.ndarray) or isinstance(arr, np.memmap) or \
+            not spills(arr.nbytes):
+        return arr
+    return copy(arr)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains StepCache class, a content-addressed on-disk cache of
+pipeline step results. A result is addressed by the hash of the input image
+pixels and the settings of every algorithm up to the step that produced it,
+so runs sharing a prefix of the pipeline on the same image skip straight to
+the first differing step. The cache has a size limit, the least recently used
+results are removed first.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+# default size limit of the cache directory in bytes
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# change this whenever cached results of older versions become invalid
+CACHE_VERSION = 1
+CACHE_EXT = '.pkl'
+
+
+def image_digest(img):
+    """
+    Hash the pixels, the shape and the type of an image array.
+
+    Args:
+        | *img* (ndarray): input image
+
+    Returns:
+        *digest* (str): hex digest of the image
+
+    """
+    digest = hashlib.sha1()
+    digest.update(str((img.shape, img.dtype.str)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(img).data)
+    return digest.hexdigest()
+
+
+class StepCache:
+    """
+    Content-addressed on-disk cache of [img, graph] step results.
+    Several processes may share a cache directory.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            | *cache_dir* (str): directory holding the cached results
+            | *max_bytes* (int): size limit of the cache directory in bytes
+
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_keys(self, img, executed_cats):
+        """
+        Create the cache keys of the results of all categories in the
+        pipeline for the given input image.
+
+        Args:
+            | *img* (ndarray): input image
+            | *executed_cats* (list): a list of Categories in the pipeline
+
+        Returns:
+            | *keys* (list): a cache key for every category
+
+        """
+        digest = image_digest(img)
+        reports = []
+        keys = []
+        for cat in executed_cats:
+            alg_name, alg_dic = cat.active_algorithm.report_pip()
+            settings = [[name, value] for name, value in alg_dic.items()
+                        if name != 'store_image']
+            reports.append([alg_name, settings])
+            step_id = json.dumps([CACHE_VERSION, digest, reports])
+            keys.append(hashlib.sha1(step_id.encode('utf-8')).hexdigest())
+        return keys
+
+    def find_last(self, keys):
+        """
+        Find the last step whose result is cached.
+
+        Args:
+            | *keys* (list): cache keys as returned by ``get_keys()``
+
+        Returns:
+            | *index*, *result* : index of the cached step and its result,
+              (-1, None) if no step result is cached
+
+        """
+        for index in reversed(range(len(keys))):
+            result = self.get(keys[index])
+            if result is not None:
+                return index, result
+        return -1, None
+
+    def get(self, key):
+        """
+        Load a cached result and mark it as recently used.
+
+        Args:
+            | *key* (str): cache key
+
+        Returns:
+            | *result* (list): [img, graph] or None if it is not cached
+
+        """
+        path = os.path.join(self.cache_dir, key + CACHE_EXT)
+        try:
+            with open(path, 'rb') as cached:
+                result = pickle.load(cached)
+            os.utime(path, None)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # missing, evicted by another process or partially written
+            return None
+        return result
+
+    def put(self, key, result):
+        """
+        Cache a result and remove the least recently used results if the
+        size limit is exceeded.
+
+        Args:
+            | *key* (str): cache key
+            | *result* (list): [img, graph]
+
+        """
+        path = os.path.join(self.cache_dir, key + CACHE_EXT)
+        tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as cached:
+                pickle.dump(list(result[0:2]), cached,
+                            pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as ex:
+            print('WARNING in StepCache.put() Cannot write to the step '
+                  'cache:', ex)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used results until the cache directory is
+        smaller than the size limit.
+        """
+        entries = []
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith(CACHE_EXT):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, fname))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fname))
+        total = sum(size for _, size, _ in entries)
+        for _, size, fname in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, fname))
+            except OSError:
+                continue
+            total -= size
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains ParameterSweep class that runs a pipeline with every
+combination of a set of algorithm settings. The combinations are processed as
+a tree: the result of every shared prefix of pipeline steps is computed once
+and reused by each branch below it. Graph statistics of every combination are
+written to a summary table.
+
+A sweep is described by a json file listing the swept settings, e.g.::
+
+    [{"step": 0, "name": "Foreground Iteration", "values": [1, 2, 3]},
+     {"step": 2, "name": "Attribute treshold", "range": [1.0, 5.0, 0.5]},
+     {"step": 2, "name": "Operator", "values": "all"}]
+
+*step* is the category position in the pipeline, *name* the name of an
+IntegerSlider, FloatSlider or DropDown of its algorithm. *range* lists start,
+stop (inclusive) and step size, *values* an explicit list or "all" options of
+a DropDown.
+"""
+import csv
+import itertools
+import os
+import sys
+
+import demjson
+
+from nefi2.model.algorithms._alg import IntegerSlider, FloatSlider, DropDown
+from nefi2.model.algorithms import _utility
+from nefi2.model.pipeline import read_image_file
+from nefi2.model.result_store import copy_result
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+def expand_values(element, spec):
+    """
+    Create the list of values a ui element is swept over.
+
+    Args:
+        | *element* : IntegerSlider, FloatSlider or DropDown
+        | *spec* (dict): sweep entry with either "values" or "range"
+
+    Returns:
+        | *values* (list): the values to sweep over
+
+    """
+    if 'range' in spec:
+        start, stop, step = spec['range']
+        count = int(round((stop - start) / step)) + 1
+        values = [start + i * step for i in range(count)]
+        if isinstance(element, IntegerSlider):
+            return [int(round(value)) for value in values]
+        return [round(value, 10) for value in values]
+    if spec['values'] == 'all' and isinstance(element, DropDown):
+        return sorted(element.options)
+    return list(spec['values'])
+
+
+class ParameterSweep:
+    """
+    Run a pipeline over all combinations of the swept settings.
+    """
+
+    def __init__(self, pipeline, sweep_path):
+        """
+        Args:
+            | *pipeline* (Pipeline): a pipeline with loaded categories,
+              input files and output directory
+            | *sweep_path* (str): path to the sweep json file
+
+        Public Attributes:
+            | *pipeline* (Pipeline): the swept pipeline
+            | *step_params* (list): for every category a list of
+              (ui element, values) tuples
+            | *rows* (list): one summary table row per processed combination
+
+        """
+        self.pipeline = pipeline
+        self.step_params = [[] for _ in pipeline.executed_cats]
+        self.rows = []
+        try:
+            sweep = demjson.decode_file(sweep_path, "UTF-8")
+        except demjson.JSONDecodeError as ex:
+            print(ex)
+            print('ERROR in ParameterSweep() Unable to parse ' + sweep_path)
+            sys.exit(1)
+        for spec in sweep:
+            cat = pipeline.executed_cats[spec['step']]
+            element = cat.active_algorithm.find_ui_element(spec['name'])
+            if not isinstance(element, (IntegerSlider, FloatSlider,
+                                        DropDown)):
+                raise AssertionError("Algorithm " +
+                                     cat.active_algorithm.name +
+                                     " has no slider or drop down " +
+                                     spec['name'])
+            values = expand_values(element, spec)
+            # validate all values before processing anything
+            default = element.value
+            for value in values:
+                element.set_value(value)
+            element.set_value(default)
+            self.step_params[spec['step']].append((element, values))
+
+    def get_step_settings(self, step):
+        """
+        Create all combinations of the swept settings of a category.
+
+        Args:
+            | *step* (int): category position in the pipeline
+
+        Returns:
+            | *settings* (list): a list of [(ui element, value), ...] lists
+
+        """
+        params = self.step_params[step]
+        combinations = itertools.product(*[values for _, values in params])
+        return [list(zip([element for element, _ in params], combination))
+                for combination in combinations]
+
+    def run(self):
+        """
+        Process all input images with all combinations and write the
+        summary table to the output directory.
+
+        Returns:
+            | *table_path* (str): path of the written summary table
+
+        """
+        defaults = [(element, element.value)
+                    for params in self.step_params
+                    for element, _ in params]
+        try:
+            for fpath in self.pipeline.input_files:
+                img = read_image_file(fpath, '', None)
+                self._run_step(fpath, 0, [img, None], [])
+        finally:
+            for element, value in defaults:
+                element.set_value(value)
+        return self.write_table()
+
+    def _run_step(self, fpath, step, data, assignment):
+        """
+        Depth-first traversal of the combination tree. The input *data* of a
+        category is shared by all settings of this category, so every
+        pipeline prefix is processed only once.
+
+        Args:
+            | *fpath* (str): image file path
+            | *step* (int): category position in the pipeline
+            | *data* (list): [img, graph] input of the category
+            | *assignment* (list): (ui element, value) tuples chosen so far
+
+        """
+        cats = self.pipeline.executed_cats
+        if step == len(cats):
+            self.add_row(fpath, assignment, data[1])
+            return
+        cat = cats[step]
+        all_settings = self.get_step_settings(step)
+        for num, settings in enumerate(all_settings):
+            for element, value in settings:
+                element.set_value(value)
+            # algorithms may modify their input, every branch gets a copy
+            if num < len(all_settings) - 1:
+                step_input = [copy_result(arg) for arg in data]
+            else:
+                step_input = data
+            cat.process(step_input)
+            result = list(cat.active_algorithm.result.items())
+            result.sort(key=lambda x: ['img', 'graph'].index(x[0]))
+            result = [i[1] for i in result]
+            self._run_step(fpath, step + 1, result,
+                           assignment + [(step, element, value)
+                                         for element, value in settings])
+
+    def add_row(self, fpath, assignment, graph):
+        """
+        Add the graph statistics of a processed combination to the summary
+        table.
+
+        Args:
+            | *fpath* (str): image file path
+            | *assignment* (list): (step, ui element, value) tuples
+            | *graph* : the resulting graph or None
+
+        """
+        row = [('image', os.path.basename(fpath))]
+        for step, element, value in assignment:
+            row.append(('{0}: {1}'.format(step, element.name), value))
+        row.extend(_utility.graph_statistics(graph).items())
+        self.rows.append(row)
+        print('Sweep', len(self.rows), ', '.join('{0}={1}'.format(*col)
+                                                 for col in row))
+
+    def write_table(self):
+        """
+        Write the summary table as csv file to the output directory.
+
+        Returns:
+            | *table_path* (str): path of the written summary table
+
+        """
+        pip_name = os.path.splitext(
+            os.path.basename(self.pipeline.pipeline_path))[0]
+        table_path = os.path.join(self.pipeline.out_dir,
+                                  'sweep_' + pip_name + '.csv')
+        with open(table_path, 'w', newline='') as table:
+            writer = csv.writer(table)
+            if self.rows:
+                writer.writerow([name for name, _ in self.rows[0]])
+            for row in self.rows:
+                writer.writerow([value for _, value in row])
+        print('Success!', os.path.basename(table_path), 'saved in',
+              self.pipeline.out_dir)
+        return table_path
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains the tiled execution of the Preprocessing and
+Segmentation steps of a pipeline. Instead of running every algorithm on the
+whole image, the image is cut into tiles which run through all tileable steps
+one after the other. Every tile is extended by a halo of the surrounding
+pixels, wide enough for the neighborhoods of all these steps, so that the
+stitched segmentation mask equals the one computed on the whole image. The
+intermediate results of the steps are only as large as a tile.
+
+Algorithms of the following steps may implement their own tiled processing,
+see ``Algorithm.process_tiled()``, e.g. the Guo Hall graph detection thins
+and traces the tiles in parallel worker processes.
+"""
+import numpy as np
+
+from nefi2.model import scratch
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+TILEABLE_CATEGORIES = ('Preprocessing', 'Segmentation')
+
+
+def tile_ranges(length, tile_size):
+    """
+    Split an image axis into tiles.
+
+    Args:
+        | *length* (int): length of the image axis
+        | *tile_size* (int): tile length
+
+    Returns:
+        | *ranges* (list): a list of (start, stop) tuples
+
+    """
+    return [(start, min(start + tile_size, length))
+            for start in range(0, length, tile_size)]
+
+
+def tile_boxes(shape, tile_size):
+    """
+    Split an image into tiles.
+
+    Args:
+        | *shape* (tuple): image shape
+        | *tile_size* (int): tile length
+
+    Returns:
+        | *boxes* (list): a list of (top, bottom, left, right) tuples in
+          row-major order
+
+    """
+    return [(top, bottom, left, right)
+            for top, bottom in tile_ranges(shape[0], tile_size)
+            for left, right in tile_ranges(shape[1], tile_size)]
+
+
+def tile_window(img, box, halo):
+    """
+    Cut a tile together with its halo out of an image. The halo is clipped
+    at the image border.
+
+    Args:
+        | *img* (ndarray): image
+        | *box* (tuple): (top, bottom, left, right) bounds of the tile
+        | *halo* (int): number of pixels added on each side of the tile
+
+    Returns:
+        | *window* (ndarray): contiguous copy of the tile with its halo
+        | *origin* (tuple): (top, left) position of *window* in the image
+        | *core* (tuple): (top, bottom, left, right) bounds of the tile in
+          *window*
+
+    """
+    top, bottom, left, right = box
+    rows, cols = img.shape[:2]
+    halo_top, halo_left = max(top - halo, 0), max(left - halo, 0)
+    window = np.array(img[halo_top:min(bottom + halo, rows),
+                          halo_left:min(right + halo, cols)])
+    return (window, (halo_top, halo_left),
+            (top - halo_top, bottom - halo_top,
+             left - halo_left, right - halo_left))
+
+
+def count_tileable(executed_cats):
+    """
+    Count the leading pipeline steps that can be processed in tiles. These
+    are the Preprocessing and Segmentation steps up to the first algorithm
+    which needs the whole image, see ``Algorithm.tile_halo()``.
+
+    Args:
+        | *executed_cats* (list): a list of Categories in the pipeline
+
+    Returns:
+        | *count* (int): number of tileable steps at the pipeline start
+
+    """
+    count = 0
+    for cat in executed_cats:
+        if cat.get_name() not in TILEABLE_CATEGORIES or \
+                cat.active_algorithm.tile_halo() is None:
+            break
+        count += 1
+    return count
+
+
+def process_tiled(cats, img, tile_size):
+    """
+    Run the given steps on an image tile by tile and stitch the results.
+
+    Args:
+        | *cats* (list): tileable Categories, see ``count_tileable()``
+        | *img* (ndarray): input image
+        | *tile_size* (int): tile length without the halo
+
+    Returns:
+        | *result* (ndarray): the result image of the last step,
+          memory-mapped if it is large, see nefi2.model.scratch
+
+    """
+    halo = sum(cat.active_algorithm.tile_halo() for cat in cats)
+    result = None
+    for box in tile_boxes(img.shape, tile_size):
+        window, _, (top, bottom, left, right) = tile_window(img, box, halo)
+        data = [window, None]
+        for cat in cats:
+            cat.process(data)
+            data = [cat.active_algorithm.result['img'], None]
+        tile = data[0][top:bottom, left:right]
+        if result is None:
+            result = scratch.empty(img.shape[:2] + tile.shape[2:],
+                                   tile.dtype)
+        result[box[0]:box[1], box[2]:box[3]] = tile
+    return result
+
+
+if __name__ == '__main__':
+    pass
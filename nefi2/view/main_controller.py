@@ -8,19 +8,22 @@ To draw the complete UI the controllers are invoked and the draw_ui function is
 called
 """
 from nefi2.model.pipeline import *
+from nefi2.model.algorithms._alg import Algorithm, IntegerSlider, \
+    FloatSlider, CheckBox, DropDown
 import copy
 import time
 import os
 import traceback
 
 import sys
+import numpy
 import zope.event.classhandler
 import PyQt5
 import webbrowser
 
 from PyQt5 import QtWidgets, uic, QtCore, QtGui
 from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
-from PyQt5.QtGui import QIcon, QPixmap, QPainter, QWheelEvent
+from PyQt5.QtGui import QIcon, QPixmap, QPainter, QWheelEvent, QImage
 from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot, QObject, QEvent, QTimer, QSize, QRect, QFile, QIODevice
 from PyQt5.QtWidgets import QBoxLayout, QGroupBox, QSpinBox, QDoubleSpinBox, QSlider, QLabel, QWidget, QHBoxLayout, \
     QVBoxLayout, QStackedWidget, QComboBox, QSizePolicy, QToolButton, QMenu, QAction, QMessageBox, QApplication, \
@@ -31,6 +34,22 @@ __authors__ = {"Dennis Groß": "gdennis91@googlemail.com",
                "Philipp Reichert": "prei@me.com"}
 
 
+def declare_model_slots():
+    """
+    Declare the setters of the algorithm settings as Qt slots. The model
+    does not import Qt, so that batch mode and its worker processes run
+    without it, the slot binding is applied here when the UI is loaded.
+    """
+    Algorithm.set_store_image = pyqtSlot(bool)(Algorithm.set_store_image)
+    IntegerSlider.set_value = pyqtSlot(int)(IntegerSlider.set_value)
+    FloatSlider.set_value = pyqtSlot(float)(FloatSlider.set_value)
+    CheckBox.set_value = pyqtSlot(bool)(CheckBox.set_value)
+    DropDown.set_value = pyqtSlot(str)(DropDown.set_value)
+
+
+declare_model_slots()
+
+
 try:
     mainview_path = os.path.join('nefi2', 'view', 'MainView.ui')
     base, form = uic.loadUiType(mainview_path)
@@ -38,6 +57,29 @@ except (FileNotFoundError):
     raise NameError(os.listdir(os.curdir))
 
 
+def array_to_pixmap(img):
+    """
+    Convert an OpenCV BGR or grayscale image array into a QPixmap, so that
+    intermediate results can be shown without writing them to disk.
+
+    Args:
+        img: the image array
+
+    Returns: a QPixmap holding a copy of the image
+
+    """
+    if len(img.shape) == 2:
+        img = numpy.ascontiguousarray(img)
+        image = QImage(img.data, img.shape[1], img.shape[0], img.strides[0],
+                       QImage.Format_Grayscale8)
+    else:
+        img = numpy.ascontiguousarray(img[:, :, 2::-1])
+        image = QImage(img.data, img.shape[1], img.shape[0], img.strides[0],
+                       QImage.Format_RGB888)
+    # fromImage copies the pixels, img may be released afterwards
+    return QPixmap.fromImage(image)
+
+
 # class CustomMainView(QWidget):
 #
 #    def __init__(self):
@@ -646,7 +688,10 @@ class MainView(base, form):
             event: the event from the model
         """
 
-        path = event.path
+        if event.img is not None:
+            path = array_to_pixmap(event.img)
+        else:
+            path = event.path
 
         pixmap = QPixmap(path)
         self.MidCustomWidget.setCurrentImage(pixmap)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the graph detection of nefi2.model.algorithms.guo_hall.
+"""
+import os
+import unittest
+
+import cv2
+import numpy as np
+import thinning
+
+from nefi2.model.algorithms import guo_hall
+from nefi2.model.algorithms._graph import CompactGraph
+import nefi1_guo_hall
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         os.pardir, 'sample_images')
+
+
+def segmented_lines():
+    """
+    Create a segmented image of crossing lines of different widths and a
+    ring.
+    """
+    xs, ys = np.mgrid[:90, :120]
+    lines = [(5, 5, 80, 110, 3), (80, 10, 10, 100, 5), (45, 0, 45, 119, 2),
+             (0, 60, 89, 70, 4)]
+    segmented = np.zeros(xs.shape, np.bool_)
+    for x0, y0, x1, y1, radius in lines:
+        along = np.clip(((xs - x0) * (x1 - x0) + (ys - y0) * (y1 - y0)) /
+                        float((x1 - x0) ** 2 + (y1 - y0) ** 2), 0, 1)
+        segmented |= np.hypot(xs - x0 - along * (x1 - x0),
+                              ys - y0 - along * (y1 - y0)) <= radius
+    center = np.hypot(xs - 25, ys - 90)
+    segmented |= (center >= 8) & (center <= 12)
+    return np.where(segmented, 255, 0).astype(np.uint8)
+
+
+def segmented_grid():
+    """
+    Create a segmented image of a grid of lines getting wider to the bottom
+    and the right, crossed by diagonal lines. Its skeleton has more than 255
+    nodes.
+    """
+    xs, ys = np.mgrid[:200, :260]
+    segmented = (xs % 9 < 1 + ys // 90) | (ys % 11 < 1 + xs // 70)
+    segmented |= (xs + 2 * ys) % 37 < 3
+    return np.where(segmented, 255, 0).astype(np.uint8)
+
+
+def assert_same_graph(test, graph, other):
+    """
+    Assert that two CompactGraph objects have the same nodes and edges.
+    """
+    for name in ('xs', 'ys', 'src', 'dst'):
+        np.testing.assert_array_equal(getattr(graph, name),
+                                      getattr(other, name))
+    test.assertEqual(list(graph.edge_attrs), list(other.edge_attrs))
+    for name, values in graph.edge_attrs.items():
+        np.testing.assert_allclose(values, other.edge_attrs[name])
+
+
+def assert_same_as_nefi1(test, skeleton, segmented):
+    """
+    Assert that both edge detection engines find the edges, their order and
+    their properties of the breadth first search of nefi1.
+    """
+    nodes = guo_hall.zhang_suen_node_detection(skeleton)
+    expected = nefi1_guo_hall.breadth_first_edge_detection(
+        skeleton, segmented, nodes.to_networkx())
+    expected_edges = list(expected.edges(data=True))
+    test.assertTrue(expected_edges)
+    for detect in (guo_hall.breadth_first_edge_detection,
+                   guo_hall.array_edge_detection):
+        nodes = guo_hall.zhang_suen_node_detection(skeleton)
+        edges = list(detect(skeleton, segmented, nodes).to_networkx()
+                     .edges(data=True))
+        test.assertEqual([(u, v) for u, v, _ in edges],
+                         [(u, v) for u, v, _ in expected_edges])
+        for name in ('pixels', 'length', 'width', 'width_var'):
+            np.testing.assert_allclose(
+                [data[name] for _, _, data in edges],
+                [data[name] for _, _, data in expected_edges],
+                err_msg=name)
+
+
+def edge_pixels(graph):
+    """
+    Return the pixel count of every edge keyed by the coordinates of its
+    nodes.
+    """
+    nodes = list(zip(graph.xs.tolist(), graph.ys.tolist()))
+    return dict((frozenset((nodes[s], nodes[d])), pixels)
+                for s, d, pixels in zip(graph.src, graph.dst,
+                                        graph.edge_attrs['pixels']))
+
+
+class TestBranchEdgeDetection(unittest.TestCase):
+
+    def setUp(self):
+        # a rectangle with a node on its left and on its right side
+        self.ring = np.zeros((12, 14), np.uint8)
+        self.ring[2, 2:12] = self.ring[9, 2:12] = 255
+        self.ring[2:10, 2] = self.ring[2:10, 11] = 255
+
+    def test_parallel_branches(self):
+        # the lower branch keeps a node next to the right node
+        graph = guo_hall.branch_edge_detection(
+            self.ring, self.ring, CompactGraph([5, 5], [2, 11]))
+        self.assertEqual(edge_pixels(graph),
+                         {frozenset(((5, 2), (5, 11))): 14,
+                          frozenset(((5, 2), (6, 11))): 15,
+                          frozenset(((6, 11), (5, 11))): 0})
+        np.testing.assert_allclose(graph.edge_attrs['length'], [15, 16, 1])
+        np.testing.assert_allclose(graph.edge_attrs['width'], 2)
+
+    def test_loop(self):
+        graph = guo_hall.branch_edge_detection(
+            self.ring, self.ring, CompactGraph([5], [2]))
+        self.assertEqual(graph.number_of_nodes(), 1)
+        self.assertEqual(graph.number_of_edges(), 0)
+
+    def test_branch_touching_three_nodes(self):
+        # a junction without a node pixel joins all three end nodes
+        skel = np.zeros((12, 14), np.uint8)
+        skel[1:6, 6] = skel[6, 1:12] = 255
+        graph = guo_hall.branch_edge_detection(
+            skel, skel, CompactGraph([1, 6, 6], [6, 1, 11]))
+        self.assertEqual(edge_pixels(graph),
+                         {frozenset(((1, 6), (6, 1))): 13,
+                          frozenset(((1, 6), (6, 11))): 13,
+                          frozenset(((6, 1), (6, 11))): 13})
+
+
+class TestEdgeDetection(unittest.TestCase):
+
+    def test_sample_images(self):
+        for name in ('bahn.png', 'crack.jpg', 'leaf.jpg', 'band300180.jpg'):
+            img = cv2.imread(os.path.join(IMAGE_DIR, name),
+                             cv2.IMREAD_GRAYSCALE)
+            _, segmented = cv2.threshold(img[:300, :400], 0, 255,
+                                         cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            skeleton = thinning.guo_hall_thinning(segmented.copy())
+            assert_same_as_nefi1(self, skeleton, segmented)
+
+    def test_label_dtypes(self):
+        # the edge trace holds the labels in uint8 and in uint16
+        for segmented, dtype in ((segmented_lines(), np.uint8),
+                                 (segmented_grid(), np.uint16)):
+            skeleton = thinning.guo_hall_thinning(segmented.copy())
+            nodes = guo_hall.zhang_suen_node_detection(skeleton)
+            self.assertEqual(guo_hall.label_dtype(len(nodes)), dtype)
+            assert_same_as_nefi1(self, skeleton, segmented)
+
+
+class TestProcessTiled(unittest.TestCase):
+
+    def test_tiled_equals_process(self):
+        segmented = segmented_lines()
+        for engine in ('array', 'breadth first', 'branches'):
+            alg = guo_hall.AlgBody()
+            alg.edge_tracing.set_value(engine)
+            alg.process([segmented.copy(), None])
+            skeleton, graph = alg.result['img'], alg.result['graph']
+            self.assertTrue(graph.number_of_edges())
+            for tile_size, jobs in ((17, 1), (40, 1), (40, 2)):
+                alg.process_tiled([segmented.copy(), None], tile_size, jobs)
+                np.testing.assert_array_equal(alg.result['img'], skeleton)
+                assert_same_graph(self, alg.result['graph'], graph)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the batch and UI processing of nefi2.model.pipeline.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+import numpy as np
+
+from nefi2.model import pipeline
+from nefi2.model.pipeline import Pipeline
+from nefi2.model.result_store import ResultStore
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+class AddOne:
+    """
+    An algorithm adding one to the image.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.store_image = False
+        self.result = {'img': None, 'graph': None}
+
+    def report_pip(self):
+        return self.name, {}
+
+    def process(self, args):
+        self.result['img'] = args[0] + 1
+        self.result['graph'] = None
+
+
+class FakeCategory:
+
+    def __init__(self, name):
+        self.name = name
+        self.active_algorithm = AddOne(name)
+
+    def get_name(self):
+        return self.name
+
+    def process(self, args):
+        self.active_algorithm.process(args)
+
+
+class PipelineTestCase(unittest.TestCase):
+    """
+    Run every test in a temporary working directory, Pipeline creates its
+    output directory there.
+    """
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        self.pipeline = Pipeline(OrderedDict())
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp_dir)
+
+
+class TestProcessBatch(PipelineTestCase):
+
+    def test_failing_image_stops_batch(self):
+        # the reader thread fills the queue while the first image fails
+        self.pipeline.input_files = ['a.png', 'b.png', 'c.png']
+        self.pipeline.queue_depth = 2
+        self.pipeline.compile = mock.Mock()
+
+        def compute_results(fpath, img):
+            threading.Event().wait(0.5)
+            raise RuntimeError(fpath)
+
+        self.pipeline.compute_results = compute_results
+        errors = []
+
+        def process_batch():
+            try:
+                self.pipeline.process_batch()
+            except RuntimeError as ex:
+                errors.append(ex)
+
+        with mock.patch.object(pipeline, 'read_input_file',
+                               return_value=np.zeros((4, 4), np.uint8)):
+            batch = threading.Thread(target=process_batch, daemon=True)
+            batch.start()
+            batch.join(10)
+        self.assertFalse(batch.is_alive())
+        self.assertEqual([str(ex) for ex in errors], ['a.png'])
+
+
+class TestProcess(PipelineTestCase):
+
+    def test_evicted_previous_result(self):
+        # the store holds two results, storing the input image evicts the
+        # result the second run would continue from
+        self.pipeline.result_store = ResultStore(32)
+        self.pipeline.input_files = ['a.png']
+        self.pipeline.executed_cats = [FakeCategory('Preprocessing'),
+                                       FakeCategory('Segmentation')]
+        self.pipeline.save_results = mock.Mock()
+        with mock.patch.object(pipeline, 'read_image_file',
+                               return_value=np.zeros((4, 4), np.uint8)):
+            self.pipeline.process()
+            self.pipeline.process()
+        for call in self.pipeline.save_results.call_args_list:
+            np.testing.assert_array_equal(call[0][2][0], 2)
+        self.assertEqual(self.pipeline.save_results.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the chain contraction of nefi2.model.algorithms.smooth_degree_two_nodes.
+"""
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+from nefi2.model.algorithms._graph import CompactGraph
+from nefi2.model.algorithms.smooth_degree_two_nodes import contract_chains
+
+
+__authors__ = {"Pavel Shkadzko": "p.shkadzko@gmail.com"}
+
+
+def make_graph(num_nodes, edges):
+    """
+    Create a CompactGraph with nodes (i, 0) and an edge of length 1 for
+    every (src, dst) pair.
+    """
+    src, dst = np.array(edges).T
+    ones = np.ones(len(edges))
+    return CompactGraph(np.arange(num_nodes), np.zeros(num_nodes, np.int64),
+                        src, dst,
+                        OrderedDict([('pixels', ones), ('length', ones),
+                                     ('width', ones), ('width_var', ones)]))
+
+
+def edge_lengths(graph):
+    """
+    Return the length of every edge keyed by the x coordinates of its ends.
+    """
+    return dict((frozenset((int(graph.xs[s]), int(graph.xs[d]))), length)
+                for s, d, length in zip(graph.src, graph.dst,
+                                        graph.edge_attrs['length']))
+
+
+class TestContractChains(unittest.TestCase):
+
+    def test_chain(self):
+        # 2 and 3 are degree two nodes between 0 and 1
+        graph = make_graph(8, [(0, 4), (0, 5), (1, 6), (1, 7), (0, 2),
+                               (2, 3), (3, 1)])
+        self.assertEqual(contract_chains(graph), 2)
+        self.assertEqual(edge_lengths(graph),
+                         {frozenset((0, 4)): 1, frozenset((0, 5)): 1,
+                          frozenset((1, 6)): 1, frozenset((1, 7)): 1,
+                          frozenset((0, 1)): 3})
+
+    def test_chain_parallel_to_edge(self):
+        # A-B plus A-x-y-B becomes A-y-B like in pairwise mode
+        graph = make_graph(6, [(0, 4), (1, 5), (0, 1), (0, 2), (2, 3),
+                               (3, 1)])
+        self.assertEqual(contract_chains(graph), 1)
+        self.assertEqual(edge_lengths(graph),
+                         {frozenset((0, 4)): 1, frozenset((1, 5)): 1,
+                          frozenset((0, 1)): 1, frozenset((0, 3)): 2,
+                          frozenset((3, 1)): 1})
+
+    def test_parallel_chains(self):
+        # the first chain between A and B is contracted, the second one
+        # keeps its last degree two node
+        graph = make_graph(7, [(0, 5), (1, 6), (0, 2), (2, 1), (0, 3),
+                               (3, 4), (4, 1)])
+        self.assertEqual(contract_chains(graph), 2)
+        self.assertEqual(edge_lengths(graph),
+                         {frozenset((0, 5)): 1, frozenset((1, 6)): 1,
+                          frozenset((0, 1)): 2, frozenset((0, 4)): 2,
+                          frozenset((4, 1)): 1})
+
+    def test_loop(self):
+        # A-x-y-z-A becomes a triangle instead of a self loop
+        graph = make_graph(6, [(0, 4), (0, 5), (0, 1), (1, 2), (2, 3),
+                               (3, 0)])
+        self.assertEqual(contract_chains(graph), 1)
+        self.assertEqual(edge_lengths(graph),
+                         {frozenset((0, 4)): 1, frozenset((0, 5)): 1,
+                          frozenset((0, 1)): 1, frozenset((1, 3)): 2,
+                          frozenset((3, 0)): 1})
+
+
+if __name__ == '__main__':
+    unittest.main()